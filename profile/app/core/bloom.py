@@ -0,0 +1,69 @@
+import math
+from hashlib import blake2b
+from typing import Iterable, List, Optional
+
+# Counter 8-bit: đạt giá trị này thì không tăng/giảm nữa (tránh false negative)
+_MAX_COUNT = 255
+
+
+class CountingBloomFilter:
+    """Counting Bloom filter (hỗ trợ xóa) cho membership test trong bộ nhớ
+
+    ``item not in filter`` là chắc chắn đúng; ``item in filter`` có thể là false
+    positive với xác suất ~error_rate khi số phần tử <= capacity. Mỗi counter
+    là 1 byte trong một bytearray, vị trí tính bằng double hashing trên blake2b.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.error_rate = error_rate
+        self._resize(capacity)
+
+    def _resize(self, capacity: int) -> None:
+        self.capacity = max(capacity, 1)
+        size = math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        self._hash_count = max(1, round(size / self.capacity * math.log(2)))
+        self._counters = bytearray(size)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._counters)
+
+    def _positions(self, item: str) -> List[int]:
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = len(self._counters)
+        return [(h1 + i * h2) % size for i in range(self._hash_count)]
+
+    def __contains__(self, item: str) -> bool:
+        counters = self._counters
+        return all(counters[position] for position in self._positions(item))
+
+    def add(self, item: str) -> None:
+        counters = self._counters
+        for position in self._positions(item):
+            if counters[position] < _MAX_COUNT:
+                counters[position] += 1
+        self._count += 1
+
+    def remove(self, item: str) -> None:
+        """Xóa phần tử đã được add (xóa phần tử chưa add có thể gây false negative)"""
+        positions = self._positions(item)
+        counters = self._counters
+        if not all(counters[position] for position in positions):
+            return
+        for position in positions:
+            if counters[position] < _MAX_COUNT:
+                counters[position] -= 1
+        self._count = max(self._count - 1, 0)
+
+    def load(self, items: Iterable[str], capacity: Optional[int] = None) -> None:
+        """Build lại filter từ đầu, có thể đổi capacity"""
+        items = list(items)
+        self._resize(max(capacity or self.capacity, len(items)))
+        for item in items:
+            self.add(item)
@@ -0,0 +1,259 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import after_commit
+
+
+class CacheStats:
+    """Bộ đếm hit/miss/eviction của một cache (tích lũy từ lúc khởi động)"""
+
+    __slots__ = ("hits", "misses", "evictions", "expirations", "invalidations")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class CachedResponse(NamedTuple):
+    """Response JSON đã serialize kèm validators cho conditional GET"""
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+class ResponseCache:
+    """LRU cache trong bộ nhớ với TTL, lưu response đã serialize sẵn (bytes)
+
+    Giới hạn theo cả số entry và tổng số byte, ttl <= 0 để tắt. Cache nằm trong
+    từng process: invalidation chỉ áp dụng cho worker thực hiện ghi, worker khác
+    có thể trả về dữ liệu cũ tối đa ``ttl`` giây (cộng độ trễ replica nếu entry
+    được nạp từ replica ngay trước lần ghi).
+
+    Trong worker thực hiện ghi, key vừa bị invalidate được nạp lại từ primary
+    trong cửa sổ read-your-writes (xem ``prefer_primary_after_invalidation``)
+    để không cache lại row cũ từ replica chưa kịp đồng bộ.
+
+    Mỗi lần invalidate/clear tăng ``generation()``. Tránh ghi lại giá trị cũ: lấy
+    generation trước khi đọc DB và truyền vào ``set``; nếu có invalidation xảy ra
+    trong lúc đó thì giá trị bị bỏ qua. Key có chứa generation (cache danh sách)
+    hết hiệu lực cùng lúc chỉ bằng một lần ``invalidate()`` O(1), entry cũ bị
+    LRU/TTL dọn dần.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, Tuple[CachedResponse, float]]" = OrderedDict()
+        self._bytes = 0
+        self._version = 0
+        # Thời điểm invalidate theo key và lần clear/invalidate toàn bộ gần nhất
+        self._invalidated_at: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._cleared_at = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def generation(self) -> int:
+        return self._version
+
+    def set(
+        self,
+        key: Hashable,
+        value: CachedResponse,
+        generation: Optional[int] = None
+    ) -> None:
+        if generation is not None and generation != self._version:
+            # Có invalidation trong lúc đọc DB, giá trị có thể đã cũ
+            return
+        if self.ttl <= 0 or len(value.body) > self.max_bytes:
+            return
+
+        self._pop(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._bytes += len(value.body)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.stats.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Xóa các key và tăng generation (không truyền key: chỉ tăng generation)"""
+        self._version += 1
+        now = time.monotonic()
+        if not keys:
+            self._cleared_at = now
+        for key in keys:
+            if self._pop(key):
+                self.stats.invalidations += 1
+            self._invalidated_at.pop(key, None)
+            self._invalidated_at[key] = now
+        while len(self._invalidated_at) > self.max_entries:
+            self._invalidated_at.popitem(last=False)
+
+    def clear(self) -> None:
+        self._version += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._cleared_at = time.monotonic()
+
+    def recently_invalidated(self, key: Optional[Hashable] = None, window: float = 0.0) -> bool:
+        """Key (hoặc cả cache nếu không truyền key) bị invalidate trong ``window`` giây qua"""
+        since = time.monotonic() - window
+        if self._cleared_at > since:
+            return True
+        if key is None:
+            return False
+        invalidated_at = self._invalidated_at.get(key)
+        return invalidated_at is not None and invalidated_at > since
+
+    def _pop(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[0].body)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+
+class TTLCache:
+    """Cache nhỏ key -> giá trị bất kỳ với TTL ngắn (ví dụ kết quả COUNT), LRU theo số entry"""
+
+    def __init__(self, ttl: float, max_entries: int = 1_024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Registry các cache để expose metrics và clear khi cần
+_caches: Dict[str, ResponseCache] = {}
+_ttl_caches: List[TTLCache] = []
+
+
+def create_cache(name: str) -> ResponseCache:
+    """Tạo (hoặc lấy lại) cache theo tên với giới hạn từ settings"""
+    if name not in _caches:
+        _caches[name] = ResponseCache(
+            name,
+            max_entries=settings.cache_max_entries,
+            max_bytes=settings.cache_max_bytes,
+            ttl=settings.cache_ttl_seconds,
+        )
+    return _caches[name]
+
+
+def create_ttl_cache(ttl: float) -> TTLCache:
+    cache = TTLCache(ttl)
+    _ttl_caches.append(cache)
+    return cache
+
+
+def cache_status() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.status() for name, cache in _caches.items()}
+
+
+def clear_caches() -> None:
+    for cache in _caches.values():
+        cache.clear()
+    for ttl_cache in _ttl_caches:
+        ttl_cache.clear()
+
+
+def invalidate_on_commit(session: AsyncSession, cache: ResponseCache, *keys: Hashable) -> None:
+    """Invalidate key ngay và một lần nữa khi transaction commit
+
+    Lần thứ hai loại bỏ giá trị cũ mà request khác đọc và đưa vào cache trong lúc
+    transaction ghi còn mở (khi đó DB vẫn trả về dữ liệu trước khi commit).
+    """
+    cache.invalidate(*keys)
+    after_commit(session, lambda: cache.invalidate(*keys))
+
+
+def prefer_primary_after_invalidation(
+    session: AsyncSession,
+    cache: ResponseCache,
+    key: Optional[Hashable] = None,
+) -> None:
+    """Gọi khi cache miss: nếu key vừa bị invalidate thì đọc từ primary
+
+    Replica có thể chưa có thay đổi vừa commit; nạp từ replica lúc này sẽ cache
+    lại giá trị cũ tới hết TTL. Cửa sổ dùng replica_read_your_writes_seconds.
+    """
+    if settings.database_replica_urls and cache.recently_invalidated(
+        key, settings.replica_read_your_writes_seconds
+    ):
+        session.info["pin_primary"] = True
+
+
+def clear_on_commit(session: AsyncSession, cache: ResponseCache) -> None:
+    """Như invalidate_on_commit nhưng xóa toàn bộ cache (không biết key nào bị ảnh hưởng)"""
+    cache.clear()
+    after_commit(session, cache.clear)
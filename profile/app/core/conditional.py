@@ -0,0 +1,147 @@
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+from fastapi import Request, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+from app.core.cache import CachedResponse
+from app.core.context import add_serialize_time
+from app.core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.core.responses import public_dicts
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+
+
+class Validators(NamedTuple):
+    """ETag và Last-Modified của một resource (không cần body)"""
+    etag: str
+    last_modified: Optional[datetime] = None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite trả về datetime naive (UTC)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _microseconds(value: datetime) -> int:
+    # Naive (SQLite) coi là UTC; tính bằng số nguyên để nhanh và chính xác tới micro giây
+    delta = value - (_EPOCH if value.tzinfo is not None else _EPOCH_NAIVE)
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def resource_validators(resource_id: int, updated_at: datetime) -> Validators:
+    """Strong ETag từ id + updated_at và Last-Modified = updated_at
+
+    updated_at do database điền bằng utcnow(): clock_timestamp() trên PostgreSQL
+    (chính xác tới micro giây, khác nhau giữa các lần UPDATE kể cả trong cùng
+    transaction); SQLite chỉ chính xác tới mili giây nên hai lần UPDATE cùng một
+    row trong cùng mili giây có thể cho cùng ETag.
+    """
+    return Validators(f'"{resource_id}-{_microseconds(updated_at):x}"', _as_utc(updated_at))
+
+
+def page_etag(versions: Iterable[Tuple[int, datetime]]) -> str:
+    """Strong ETag cho một trang danh sách: hash của các cặp (id, updated_at) theo thứ tự"""
+    payload = "".join(
+        f"{resource_id}:{_microseconds(updated_at)};" for resource_id, updated_at in versions
+    )
+    return f'"{blake2b(payload.encode(), digest_size=16).hexdigest()}"'
+
+
+def validator_headers(validators: Union[Validators, CachedResponse]) -> Dict[str, str]:
+    headers = {"ETag": validators.etag}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(validators.last_modified, usegmt=True)
+    return headers
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def not_modified(request: Request, validators: Union[Validators, CachedResponse]) -> bool:
+    """Client đã có bản hiện tại chưa (If-None-Match ưu tiên hơn If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # GET dùng weak comparison: bỏ qua tiền tố W/
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return validators.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        # HTTP date chỉ chính xác tới giây
+        return validators.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(validators: Union[Validators, CachedResponse]) -> Response:
+    return Response(status_code=304, headers=validator_headers(validators))
+
+
+def json_response(cached: CachedResponse) -> Response:
+    headers = validator_headers(cached)
+    if cached.headers:
+        headers.update(cached.headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def page_response(items: Sequence[Any], model: Type[BaseModel], limit: int) -> CachedResponse:
+    """Serialize một trang danh sách kèm ETag và header X-Next-Cursor (nếu còn trang sau)"""
+    start = time.perf_counter()
+    rows = public_dicts(items, model)
+    body = to_json(rows)
+    add_serialize_time(time.perf_counter() - start)
+    etag = page_etag((row["id"], row["updated_at"]) for row in rows)
+    cursor = next_cursor(items, limit)
+    return CachedResponse(body, etag, headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+
+
+async def conditional_get(
+    request: Request,
+    validators: Callable[[], Awaitable[Union[Validators, CachedResponse]]],
+    load: Callable[[bool], Awaitable[CachedResponse]],
+) -> Response:
+    """GET một resource với hỗ trợ 304
+
+    Với request có điều kiện, ``validators`` được gọi trước (cache hoặc query chỉ
+    lấy updated_at); body chỉ được load và serialize khi resource đã thay đổi.
+    ``load(cache_checked)`` nhận True khi ``validators`` đã tra cache (và đã đếm
+    miss), để không tra và đếm lại lần nữa.
+    """
+    current = await validators() if is_conditional(request) else None
+    if current is not None and not_modified(request, current):
+        return not_modified_response(current)
+
+    cached = current if isinstance(current, CachedResponse) else await load(current is not None)
+    return json_response(cached)
+
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """304 nếu client đã có bản hiện tại, ngược lại trả body đã serialize"""
+    if not_modified(request, cached):
+        return not_modified_response(cached)
+    return json_response(cached)
@@ -0,0 +1,67 @@
+import itertools
+import os
+import re
+from contextvars import ContextVar
+from typing import Optional
+
+# Request ID của request hiện tại (set bởi RequestIDMiddleware), None ngoài request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class RequestTimings:
+    """Số query, thời gian DB và serialize của một request (giây, cộng dồn)
+
+    Object được sửa tại chỗ nên giá trị cộng trong task/greenlet con (engine
+    events) vẫn thấy được ở middleware.
+    """
+
+    __slots__ = ("queries", "db_time", "serialize_time")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+
+# Set cùng request_id_var bởi RequestIDMiddleware, None ngoài request
+request_timings_var: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+# Request ID do client gửi lên chỉ được dùng lại nếu ngắn và an toàn để ghi log
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+_prefix = ""
+_counter = itertools.count(1)
+
+
+def _reset_id_prefix() -> None:
+    # Prefix ngẫu nhiên theo process (tạo lại sau fork) + bộ đếm tăng dần:
+    # duy nhất giữa các worker mà không tốn syscall/uuid4 cho mỗi request
+    global _prefix, _counter
+    _prefix = os.urandom(6).hex()
+    _counter = itertools.count(1)
+
+
+_reset_id_prefix()
+os.register_at_fork(after_in_child=_reset_id_prefix)
+
+
+def new_request_id() -> str:
+    return f"{_prefix}-{next(_counter):x}"
+
+
+def valid_request_id(value: str) -> bool:
+    return _VALID_REQUEST_ID.fullmatch(value) is not None
+
+
+def get_request_id() -> Optional[str]:
+    """Request ID của request đang xử lý (dùng cho log, instrumentation)"""
+    return request_id_var.get()
+
+
+def add_serialize_time(seconds: float) -> None:
+    """Cộng thời gian serialize JSON vào request hiện tại (Server-Timing)"""
+    timings = request_timings_var.get()
+    if timings is not None:
+        timings.serialize_time += seconds
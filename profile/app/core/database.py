@@ -1,27 +1,241 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+from fastapi import Request, Response
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import Select
 from sqlmodel import SQLModel
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.pool import InstrumentedQueuePool
 
+logger = logging.getLogger(__name__)
 
-# Tạo async engine với SQLite
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True,
-)
+# bind_arguments cho các query chỉ đọc có thể chạy trên replica
+REPLICA = {"replica": True}
+
+# Cookie đánh dấu client vừa ghi dữ liệu (read-your-writes)
+READ_YOUR_WRITES_COOKIE = "db_rw_until"
+
+
+def is_sqlite_file(database_url: str) -> bool:
+    """URL có phải SQLite dạng file (không phải in-memory) không"""
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _engine_options(
+    database_url: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Tạo tham số cho create_async_engine (bao gồm cấu hình pool)"""
+    options: Dict[str, Any] = {"echo": settings.db_echo, "future": True}
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and not is_sqlite_file(database_url):
+        # SQLite in-memory dùng StaticPool, không có khái niệm pool size
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size if pool_size is None else pool_size,
+        max_overflow=settings.db_max_overflow if max_overflow is None else max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_use_lifo=settings.db_pool_use_lifo,
+    )
+    return options
+
+
+def install_sqlite_pragmas(engine: AsyncEngine, read_only: bool = False) -> None:
+    """Áp dụng WAL và các pragma hiệu năng cho mỗi connection SQLite mới"""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+        "PRAGMA temp_store=MEMORY",
+        # Khuyến nghị của SQLite cho connection sống lâu
+        "PRAGMA optimize=0x10002",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=1")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+class RoutingSession(Session):
+    """Session route query chỉ đọc sang replica, còn lại vào primary
+
+    Query được đánh dấu bằng ``bind_arguments=REPLICA`` sẽ chạy trên một replica
+    ngẫu nhiên. Sau lần ghi đầu tiên, session bị pin vào primary để các lần đọc
+    tiếp theo thấy được dữ liệu vừa ghi.
+
+    ``read_any_select=True`` (reader SQLite dùng chung file, không có lag): mọi
+    SELECT không FOR UPDATE trước lần ghi đầu tiên đều chạy trên reader, không
+    chờ connection writer duy nhất; chỉ flush, INSERT/UPDATE/DELETE, SELECT ...
+    FOR UPDATE và các query sau lần ghi chạy trên writer.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        replicas: Sequence[Engine] = (),
+        read_any_select: bool = False,
+        **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.replicas = list(replicas)
+        self.read_any_select = read_any_select
+
+    def get_bind(self, mapper=None, *, clause=None, replica: bool = False, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._mark_write()
+        elif self.replicas and not self.info.get("pin_primary") and (
+            replica or self._is_plain_select(clause)
+        ):
+            return random.choice(self.replicas)
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _is_plain_select(self, clause: Any) -> bool:
+        return (
+            self.read_any_select
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        )
+
+    def _mark_write(self) -> None:
+        if self.info.get("pin_primary"):
+            return
+        self.info["pin_primary"] = True
+
+        # Báo cho client biết cần đọc từ primary trong cửa sổ read-your-writes
+        response: Optional[Response] = self.info.get("response")
+        if response is not None:
+            window = settings.replica_read_your_writes_seconds
+            response.set_cookie(
+                READ_YOUR_WRITES_COOKIE,
+                str(int(time.time() + window) + 1),
+                max_age=max(int(window), 1),
+                httponly=True,
+                samesite="lax",
+            )
+
+
+# Tạo async engine (primary) và các replica
+if is_sqlite_file(settings.database_url):
+    # SQLite: mọi lần ghi đi qua một connection duy nhất (không tranh lock giữa
+    # các writer), các lần đọc chạy trên pool connection query_only riêng
+    engine = create_async_engine(
+        settings.database_url,
+        **_engine_options(settings.database_url, pool_size=1, max_overflow=0),
+    )
+    install_sqlite_pragmas(engine)
+
+    sqlite_reader = create_async_engine(
+        settings.database_url, **_engine_options(settings.database_url)
+    )
+    install_sqlite_pragmas(sqlite_reader, read_only=True)
+    replica_engines: List[AsyncEngine] = [sqlite_reader]
+else:
+    engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url))
+    replica_engines = [
+        create_async_engine(url, **_engine_options(url))
+        for url in settings.database_replica_urls
+    ]
+
+instrument_engine(engine, "primary")
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine, "replica")
 
 
 # Tạo async session factory
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    replicas=[replica.sync_engine for replica in replica_engines],
+    read_any_select=is_sqlite_file(settings.database_url),
     expire_on_commit=False,
 )
 
 
-# Dependency để lấy async session
-async def get_session() -> AsyncSession:
+def after_commit(session: Union[AsyncSession, Session], callback: Callable[[], None]) -> None:
+    """Đăng ký callback chạy sau khi transaction hiện tại commit thành công
+
+    Dùng để cập nhật state trong bộ nhớ (index, cache...) chỉ khi dữ liệu đã thật
+    sự được ghi; callback bị bỏ qua nếu transaction rollback.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop("after_commit", ()):
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_commit_callbacks(session: Session, transaction) -> None:
+    # Transaction ngoài cùng kết thúc mà không commit (rollback/close)
+    if transaction.parent is None:
+        session.info.pop("after_commit", None)
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    """Client có đang trong cửa sổ read-your-writes không"""
+    value = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+# Dependency để lấy async session - một transaction (unit of work) cho mỗi request.
+# Repository không commit; transaction commit khi handler trả về và rollback nếu có
+# exception. Dùng với Depends(get_session, scope="function") để connection được trả
+# về pool ngay sau handler, trước khi response được gửi đi.
+async def get_session(request: Request, response: Response) -> AsyncSession:
+    async with async_session_maker() as session:
+        # Reader SQLite dùng chung file với writer nên không có replication lag
+        if settings.database_replica_urls:
+            session.info["response"] = response
+            session.info["pin_primary"] = _pinned_to_primary(request)
+        async with session.begin():
+            yield session
+
+
+async def get_batch_session(request: Request, response: Response) -> AsyncSession:
+    """Session không bọc trong transaction của request: caller tự commit từng phần
+
+    Dùng cho request dài (import) để không giữ connection trong lúc chờ client;
+    phần chưa commit bị rollback khi session đóng.
+    """
     async with async_session_maker() as session:
+        if settings.database_replica_urls:
+            session.info["response"] = response
+            session.info["pin_primary"] = _pinned_to_primary(request)
         yield session
 
 
@@ -31,7 +245,48 @@ async def create_db_and_tables():
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
+_maintenance_tasks: List[asyncio.Task] = []
+
+
+async def _optimize_sqlite() -> None:
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA optimize")
+
+
+async def _periodic(interval: float, func: Callable[[], Awaitable[None]], name: str) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await func()
+        except Exception as e:
+            logger.warning("%s failed: %s", name, e)
+
+
+def schedule_periodic(interval: float, func: Callable[[], Awaitable[None]], name: str) -> None:
+    """Chạy ``func`` mỗi ``interval`` giây trong nền, bị hủy khi close_db()"""
+    _maintenance_tasks.append(asyncio.create_task(_periodic(interval, func, name)))
+
+
+def start_db_maintenance() -> None:
+    """Khởi động các tác vụ bảo trì DB chạy nền (PRAGMA optimize định kỳ cho SQLite)"""
+    if is_sqlite_file(settings.database_url) and settings.sqlite_optimize_interval_seconds > 0:
+        schedule_periodic(
+            settings.sqlite_optimize_interval_seconds, _optimize_sqlite, "SQLite PRAGMA optimize"
+        )
+
+
 # Hàm để đóng engine khi shutdown
 async def close_db():
-    await engine.dispose()
+    for task in _maintenance_tasks:
+        task.cancel()
+    _maintenance_tasks.clear()
+
+    if is_sqlite_file(settings.database_url):
+        try:
+            await _optimize_sqlite()
+        except Exception as e:
+            logger.warning("SQLite PRAGMA optimize failed: %s", e)
 
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
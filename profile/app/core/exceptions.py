@@ -1,11 +1,16 @@
 from typing import Any, Dict, Optional
 from fastapi import HTTPException, Request, status
-from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+from app.core.logging import create_rate_limited_log
+from app.core.responses import FastJSONResponse
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Lỗi client lặp lại (ví dụ scraper gọi /profiles/{id} với id sai) chỉ log vài lần
+# mỗi cửa sổ, theo key (status, method, route, error code)
+_client_error_log = create_rate_limited_log(logger)
+
 
 class BaseAPIException(HTTPException):
     """Base exception cho tất cả API exceptions"""
@@ -50,18 +55,34 @@ class ConflictError(BaseAPIException):
         )
 
 
-async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
-    """Handler cho HTTPException"""
-    logger.warning(
-        f"HTTP {exc.status_code} error: {exc.detail}",
-        extra={"path": request.url.path, "method": request.method},
-    )
+def _should_log_client_error(request: Request, status_code: int, code: str) -> bool:
+    if not logger.isEnabledFor(logging.WARNING):
+        return False
+    # Gom theo route template thay vì path cụ thể; 404 không khớp route gom chung
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "<no route>")
+    return _client_error_log.allow((status_code, request.method, route_path, code))
+
+
+async def http_exception_handler(request: Request, exc: HTTPException) -> FastJSONResponse:
+    """Handler cho HTTPException (lỗi 4xx lặp lại được gộp log, 5xx luôn log)"""
+    code = getattr(exc, "error_code", f"HTTP_{exc.status_code}")
+    if exc.status_code >= 500:
+        logger.error(
+            "HTTP %s error: %s", exc.status_code, exc.detail,
+            extra={"path": request.url.path, "method": request.method},
+        )
+    elif _should_log_client_error(request, exc.status_code, code):
+        logger.warning(
+            "HTTP %s error: %s", exc.status_code, exc.detail,
+            extra={"path": request.url.path, "method": request.method},
+        )
     
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "error": {
-                "code": getattr(exc, "error_code", f"HTTP_{exc.status_code}"),
+                "code": code,
                 "message": exc.detail,
                 "path": request.url.path,
             }
@@ -72,15 +93,18 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
 
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
-) -> JSONResponse:
-    """Handler cho validation errors"""
+) -> FastJSONResponse:
+    """Handler cho validation errors (lỗi lặp lại cùng route được gộp log)"""
     errors = exc.errors()
-    logger.warning(
-        f"Validation error: {errors}",
-        extra={"path": request.url.path, "method": request.method},
-    )
+    if _should_log_client_error(request, status.HTTP_422_UNPROCESSABLE_CONTENT, "VALIDATION_ERROR"):
+        # Chỉ log vị trí lỗi, không đưa cả payload (có thể chứa input lớn) vào message
+        locations = ", ".join(".".join(str(part) for part in error["loc"]) for error in errors[:5])
+        logger.warning(
+            "Validation error: %d error(s) at %s", len(errors), locations,
+            extra={"path": request.url.path, "method": request.method},
+        )
 
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
         content={
             "error": {
@@ -93,15 +117,15 @@ async def validation_exception_handler(
     )
 
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> FastJSONResponse:
     """Handler cho unhandled exceptions"""
     logger.exception(
-        f"Unhandled exception: {str(exc)}",
+        "Unhandled exception: %s", exc,
         extra={"path": request.url.path, "method": request.method},
         exc_info=exc,
     )
     
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "error": {
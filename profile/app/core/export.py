@@ -0,0 +1,58 @@
+import csv
+import io
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Sequence
+import anyio
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncResult
+from app.core.config import settings
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def export_headers(name: str, export_format: ExportFormat) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{name}.{export_format.value}"'}
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def export_chunks(result: AsyncResult, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """Chuyển kết quả stream (server-side cursor) thành các chunk NDJSON/CSV
+
+    Mỗi chunk là một batch ``export_fetch_size`` row nên bộ nhớ không phụ thuộc
+    tổng số row. Khi client ngắt kết nối, generator bị hủy và cursor được close ngay.
+    """
+    try:
+        columns: Sequence[str] = list(result.keys())
+        if export_format is ExportFormat.csv:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue().encode()
+
+        async for rows in result.partitions(settings.export_fetch_size):
+            if export_format is ExportFormat.ndjson:
+                yield b"".join(to_json(dict(zip(columns, row))) + b"\n" for row in rows)
+            else:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+                yield buffer.getvalue().encode()
+    finally:
+        # Task bị cancel (client ngắt kết nối) vẫn phải close được cursor
+        with anyio.CancelScope(shield=True):
+            await result.close()
@@ -1,8 +1,14 @@
 from typing import Dict, Any
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.core.database import async_session_maker
+from app.core.cache import cache_status
+from app.core.config import settings
+from app.core.database import async_session_maker, engine, replica_engines
+from app.core.logging import log_status
+from app.core.metrics import CONTENT_TYPE, Counter, Gauge, merge_with_workers, registry, render
+from app.core.pool import pool_status
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,7 +40,7 @@ async def readiness_check() -> Dict[str, Any]:
             result.scalar()
         checks["checks"]["database"] = "ok"
     except Exception as e:
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
         checks["checks"]["database"] = "error"
         checks["status"] = "not_ready"
     
@@ -48,3 +54,98 @@ async def liveness_check() -> Dict[str, Any]:
         "status": "alive",
     }
 
+
+@router.get("/health/pool", status_code=status.HTTP_200_OK)
+async def pool_check() -> Dict[str, Any]:
+    """Pool metrics - số connection đang checkout/idle/overflow và thời gian chờ"""
+    return {
+        "status": "ok",
+        "pool": pool_status(engine),
+    }
+
+
+@router.get("/health/cache", status_code=status.HTTP_200_OK)
+async def cache_check() -> Dict[str, Any]:
+    """Cache metrics - số entry, bytes, hit/miss/eviction của từng read-through cache"""
+    return {
+        "status": "ok",
+        "caches": cache_status(),
+    }
+
+
+@router.get("/health/logging", status_code=status.HTTP_200_OK)
+async def logging_check() -> Dict[str, Any]:
+    """Trạng thái pipeline log: số record đang chờ ghi và số record bị bỏ khi queue đầy"""
+    return {
+        "status": "ok",
+        "logging": log_status(),
+    }
+
+
+# Metrics lấy từ bộ đếm sẵn có (pool, cache, log), cập nhật lúc scrape
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Số connection của pool theo trạng thái", ("role", "state")
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Số lần tra cache theo kết quả (hit/miss)", ("cache", "result")
+)
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Số entry bị loại khỏi cache", ("cache",))
+CACHE_ENTRIES = Gauge("cache_entries", "Số entry hiện có trong cache", ("cache",))
+CACHE_BYTES = Gauge("cache_bytes", "Tổng kích thước body trong cache", ("cache",))
+LOG_DROPPED = Counter("log_records_dropped_total", "Số log record bị bỏ khi queue đầy")
+
+
+def _collect_status_metrics() -> None:
+    pools = [("primary", engine)] + [("replica", replica) for replica in replica_engines]
+    totals: Dict[tuple, int] = {}
+    for role, pool_engine in pools:
+        pool = pool_status(pool_engine)
+        for state in ("checked_out", "idle", "overflow"):
+            if state in pool:
+                totals[role, state] = totals.get((role, state), 0) + pool[state]
+    for labels, value in totals.items():
+        POOL_CONNECTIONS.labels(*labels).set(value)
+
+    for name, cache in cache_status().items():
+        CACHE_REQUESTS.labels(name, "hit").set(cache["hits"])
+        CACHE_REQUESTS.labels(name, "miss").set(cache["misses"])
+        CACHE_EVICTIONS.labels(name).set(cache["evictions"])
+        CACHE_ENTRIES.labels(name).set(cache["entries"])
+        CACHE_BYTES.labels(name).set(cache["bytes"])
+
+    LOG_DROPPED.set(log_status().get("dropped", 0))
+
+
+registry.add_collector(_collect_status_metrics)
+
+
+def _add_cache_hit_ratio(snapshot: Dict[str, Any]) -> None:
+    """cache_hit_ratio tính sau khi gộp worker (tỉ lệ không cộng được giữa các process)"""
+    lookups: Dict[str, list] = {}
+    for (name, result), value in (
+        (tuple(labels), value) for labels, value in snapshot["cache_requests_total"]["samples"]
+    ):
+        counts = lookups.setdefault(name, [0, 0])
+        counts[0 if result == "hit" else 1] += value
+    snapshot["cache_hit_ratio"] = {
+        "kind": "gauge",
+        "help": "Tỉ lệ hit của cache từ lúc khởi động",
+        "labelnames": ["cache"],
+        "samples": [
+            [[name], hits / (hits + misses) if hits + misses else 0.0]
+            for name, (hits, misses) in lookups.items()
+        ],
+    }
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Metrics dạng Prometheus text; nhiều worker thì trả về tổng của tất cả worker"""
+    # Snapshot lấy trên event loop (không tranh chấp với các lần ghi metric)
+    snapshot = registry.snapshot()
+    if settings.metrics_multiproc_dir:
+        snapshot = await run_in_threadpool(
+            merge_with_workers, snapshot, settings.metrics_multiproc_dir
+        )
+    _add_cache_hit_ratio(snapshot)
+    return Response(render(snapshot), media_type=CONTENT_TYPE)
@@ -0,0 +1,84 @@
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Tuple
+import anyio
+from sqlmodel import Field, SQLModel
+from app.core.config import settings
+
+
+class ConflictAction(str, Enum):
+    """Xử lý khi record import trùng unique key: bỏ qua hoặc ghi đè"""
+    skip = "skip"
+    update = "update"
+
+
+class ImportIssue(SQLModel):
+    """Một dòng bị lỗi (failed) hoặc bị bỏ qua (skipped) trong lúc import"""
+    line: int
+    status: str
+    detail: str
+
+
+class ImportReport(SQLModel):
+    """Kết quả import; ``issues`` giới hạn theo import_max_report_issues"""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    issues: List[ImportIssue] = Field(default_factory=list)
+    issues_truncated: bool = False
+
+    def fail(self, line: int, detail: str) -> None:
+        self.failed += 1
+        self._record(line, "failed", detail)
+
+    def skip(self, line: int, detail: str) -> None:
+        self.skipped += 1
+        self._record(line, "skipped", detail)
+
+    def _record(self, line: int, status: str, detail: str) -> None:
+        if len(self.issues) < settings.import_max_report_issues:
+            self.issues.append(ImportIssue(line=line, status=status, detail=detail))
+        else:
+            self.issues_truncated = True
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Tách body NDJSON thành từng dòng (số dòng bắt đầu từ 1, bỏ qua dòng trống)
+
+    Chỉ đọc chunk kế tiếp khi dòng trước đã được xử lý nên server ngừng nhận body
+    khi import chậm hơn client (backpressure). Dòng dài hơn ``max_line_bytes``
+    được trả về dạng ``None`` và bị bỏ đi thay vì giữ trong bộ nhớ.
+    """
+    buffer = bytearray()
+    line_no = 0
+    overflow = False
+
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_no += 1
+            line = bytes(buffer[start:end]).strip()
+            if overflow or len(line) > max_line_bytes:
+                yield line_no, None
+            elif line:
+                yield line_no, line
+            overflow = False
+            start = end + 1
+        del buffer[:start]
+
+        if len(buffer) > max_line_bytes:
+            # Dòng quá dài chưa kết thúc: bỏ phần đã nhận, báo lỗi khi gặp newline
+            overflow = True
+            buffer.clear()
+
+        # Nhường event loop cho request khác giữa các chunk
+        await anyio.sleep(0)
+
+    if overflow or buffer.strip():
+        line_no += 1
+        line = bytes(buffer).strip()
+        yield line_no, None if overflow or len(line) > max_line_bytes else line
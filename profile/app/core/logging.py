@@ -1,7 +1,175 @@
+import copy
 import logging
+import queue
 import sys
-from typing import Any, Dict
+import time
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Hashable, List, Optional
+from pydantic_core import to_json
 from app.core.config import settings
+from app.core.context import request_id_var
+
+# Các thuộc tính chuẩn của LogRecord, phần còn lại (extra=...) được đưa vào JSON
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class RequestIDFilter(logging.Filter):
+    """Gắn request_id của request hiện tại (context var) vào record
+
+    Chạy trong thread gọi log nên đọc được context của request.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Một dòng JSON mỗi record: time, level, logger, message, request_id, extra, exc_info"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = record.stack_info
+        return to_json(data, fallback=repr).decode()
+
+
+# Giá trị an toàn để format muộn ở thread khác (bất biến, không tham chiếu state)
+_SIMPLE_TYPES = (str, int, float, bytes, type(None))
+
+_exception_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler không chặn: queue đầy thì bỏ record và tăng bộ đếm ``dropped``
+
+    Format JSON và ghi ra stdout do thread của QueueListener làm. Trước khi vào
+    queue chỉ resolve những gì có thể đổi trước lúc thread kịp format: args
+    không phải giá trị bất biến đơn giản (list, dict, ORM object...) và
+    exc_info (traceback giữ tham chiếu tới frame).
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, Mapping) else args
+            resolve_args = not all(isinstance(value, _SIMPLE_TYPES) for value in values)
+        else:
+            resolve_args = False
+        if not (resolve_args or record.exc_info):
+            # Trường hợp thường gặp: không copy record
+            return record
+
+        # Copy để không đổi record mà các handler khác cũng nhận
+        record = copy.copy(record)
+        if resolve_args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitedLog:
+    """Giới hạn số lần log cùng một key trong mỗi cửa sổ thời gian
+
+    ``allow(key)`` trả về True cho ``burst`` lần đầu của key trong cửa sổ, các
+    lần sau chỉ được đếm. ``flush()`` (chạy định kỳ) log một dòng tóm tắt
+    "N similar messages suppressed" cho mỗi key bị chặn rồi bắt đầu cửa sổ mới.
+    """
+
+    def __init__(self, logger: logging.Logger, window: float, burst: int):
+        self.logger = logger
+        self.window = window
+        self.burst = burst
+        # key -> [thời điểm bắt đầu cửa sổ, số lần đã log, số lần bị chặn]
+        self._keys: Dict[Hashable, List[float]] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        if self.burst <= 0 or self.window <= 0:
+            return True
+        now = time.monotonic()
+        entry = self._keys.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            if entry is not None:
+                self._summarize(key, entry)
+            self._keys[key] = [now, 1, 0]
+            return True
+        if entry[1] < self.burst:
+            entry[1] += 1
+            return True
+        entry[2] += 1
+        return False
+
+    def flush(self) -> None:
+        """Log tóm tắt các key bị chặn và bỏ các cửa sổ đã hết hạn"""
+        now = time.monotonic()
+        for key, entry in list(self._keys.items()):
+            if now - entry[0] >= self.window:
+                self._summarize(key, entry)
+                del self._keys[key]
+            elif entry[2]:
+                self._summarize(key, entry)
+                entry[2] = 0
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+    def _summarize(self, key: Hashable, entry: List[float]) -> None:
+        if entry[2]:
+            self.logger.warning(
+                "%d similar messages suppressed in the last %.0fs: %s",
+                entry[2], time.monotonic() - entry[0], key,
+            )
+
+
+_rate_limited_logs: List[RateLimitedLog] = []
+
+
+def create_rate_limited_log(logger: logging.Logger) -> RateLimitedLog:
+    """RateLimitedLog với cửa sổ/burst từ settings, được flush bởi flush_log_summaries"""
+    rate_limited = RateLimitedLog(
+        logger, settings.log_dedup_window_seconds, settings.log_dedup_burst
+    )
+    _rate_limited_logs.append(rate_limited)
+    return rate_limited
+
+
+async def flush_log_summaries() -> None:
+    """Ghi các dòng "N similar messages suppressed" (chạy định kỳ trong nền)"""
+    for rate_limited in _rate_limited_logs:
+        rate_limited.flush()
 
 
 def setup_logging() -> None:
@@ -9,25 +177,28 @@ def setup_logging() -> None:
     
     # Log level dựa trên debug mode
     log_level = logging.DEBUG if settings.debug else logging.INFO
-    
-    # Log format
-    log_format = (
-        "%(asctime)s - %(name)s - %(levelname)s - "
-        "%(message)s - [%(pathname)s:%(lineno)d]"
-    )
-    
-    # Date format
-    date_format = "%Y-%m-%d %H:%M:%S"
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-        ],
-    )
+
+    if settings.log_format == "json":
+        _setup_json_logging(log_level)
+    else:
+        # Log format
+        log_format = (
+            "%(asctime)s - %(name)s - %(levelname)s - "
+            "%(message)s - [%(pathname)s:%(lineno)d]"
+        )
+
+        # Date format
+        date_format = "%Y-%m-%d %H:%M:%S"
+
+        # Configure root logger
+        logging.basicConfig(
+            level=log_level,
+            format=log_format,
+            datefmt=date_format,
+            handlers=[
+                logging.StreamHandler(sys.stdout),
+            ],
+        )
     
     # Set log levels cho các thư viện bên ngoài
     logging.getLogger("uvicorn").setLevel(logging.INFO)
@@ -37,10 +208,73 @@ def setup_logging() -> None:
     )
     
     logger = logging.getLogger(__name__)
-    logger.info(f"Logging configured - Level: {logging.getLevelName(log_level)}")
+    logger.info("Logging configured - Level: %s", logging.getLevelName(log_level))
+
+
+def _setup_json_logging(log_level: int) -> None:
+    """Root logger ghi qua queue giới hạn, thread nền format JSON và ghi stdout"""
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    # Không cần pathname/lineno: bỏ việc dò stack frame ở mỗi lần gọi log
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logThreads = False
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(max(settings.log_queue_size, 1))
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(RequestIDFilter())
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JSONFormatter())
+    _listener = QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(log_level)
+
+    # Log của uvicorn cũng đi qua queue thay vì handler đồng bộ riêng
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+
+def shutdown_logging() -> None:
+    """Dừng thread ghi log, ghi nốt các record còn trong queue
+
+    Sau đó root logger ghi JSON trực tiếp (đồng bộ) để log sau lifespan shutdown
+    (ví dụ "Finished server process" của uvicorn) không bị kẹt trong queue.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        writer = logging.StreamHandler(sys.stdout)
+        writer.setFormatter(JSONFormatter())
+        writer.addFilter(RequestIDFilter())
+        root.addHandler(writer)
+        _queue_handler = None
+
+
+def log_status() -> Dict[str, Any]:
+    """Trạng thái queue log (chế độ json): số record đang chờ và số record bị bỏ"""
+    if _queue_handler is None:
+        return {"format": settings.log_format}
+    return {
+        "format": settings.log_format,
+        "queued": _queue_handler.queue.qsize(),
+        "queue_size": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+    }
 
 
 def get_logger(name: str) -> logging.Logger:
     """Get logger với tên cụ thể"""
     return logging.getLogger(name)
-
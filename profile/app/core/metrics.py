@@ -0,0 +1,391 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+import anyio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+from app.core.querylog import record_query
+
+logger = logging.getLogger(__name__)
+
+# Content-Type của Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def set(self, value: float) -> None:
+        # Chỉ dùng trong collector, khi bộ đếm tích lũy nằm ở nơi khác (cache, pool)
+        self.value = value
+
+    def sample(self) -> float:
+        return self.value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Sequence[float]) -> None:
+        self.upper_bounds = upper_bounds
+        # counts[i]: số quan sát rơi vào bucket i (không cộng dồn), phần tử cuối là +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def sample(self) -> List[float]:
+        return [*self.counts, self.sum]
+
+
+class Metric(ABC):
+    """Metric có label; ``labels(...)`` trả về child, nên giữ lại child ở hot path
+
+    Cập nhật không dùng lock: mọi lần ghi (request, event của SQLAlchemy, pool
+    checkout) đều chạy trên thread của event loop.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        # Metric không có label: child mặc định, có sample (0) ngay từ đầu
+        self._default = None if self.labelnames else self.labels()
+        registry.register(self)
+
+    @abstractmethod
+    def _new_child(self) -> Any:
+        """Child mới cho một bộ label values"""
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} cần labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(values), child.sample()] for values, child in self._children.items()],
+        }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    """Gauge; khi gộp nhiều worker chỉ cộng giá trị của các process còn sống"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """Tập metric của process; collector chạy lúc scrape để cập nhật giá trị lấy từ nơi khác"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} đã được đăng ký")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Snapshot dạng JSON được (dùng để render và ghi file cho chế độ nhiều worker)"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return {name: metric.describe() for name, metric in self._metrics.items()}
+
+
+registry = MetricsRegistry()
+
+
+# Metrics của ứng dụng
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Thời gian xử lý request theo method, route template và status",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Số request đang được xử lý"
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Thời gian thực thi query (cursor execute) theo engine và loại câu lệnh",
+    ("role", "operation"),
+    buckets=DB_BUCKETS,
+)
+DB_ERRORS = Counter("db_errors_total", "Số lỗi khi thực thi query", ("role",))
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Thời gian chờ lấy connection từ pool",
+    buckets=WAIT_BUCKETS,
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Số lần hết thời gian chờ connection từ pool"
+)
+
+
+def instrument_engine(engine: AsyncEngine, role: str) -> None:
+    """Đo thời gian query qua engine events (before/after_cursor_execute)
+
+    Thời gian đo được cũng được cộng vào request hiện tại và dùng cho slow-query
+    log (app.core.querylog).
+    """
+    durations = {
+        operation: DB_QUERY_DURATION.labels(role, operation)
+        for operation in ("select", "insert", "update", "delete")
+    }
+    errors = DB_ERRORS.labels(role)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is None:
+            return
+        if context.isinsert:
+            operation = "insert"
+        elif context.isupdate:
+            operation = "update"
+        elif context.isdelete:
+            operation = "delete"
+        else:
+            # SELECT và các câu lệnh khác (PRAGMA, DDL, text)
+            operation = "select"
+        duration = time.perf_counter() - start
+        durations[operation].observe(duration)
+        record_query(role, statement, duration)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        errors.inc()
+
+
+# Gộp metrics của nhiều worker (uvicorn/gunicorn --workers N): mỗi worker ghi
+# snapshot vào metrics_multiproc_dir, worker nhận scrape đọc và cộng tất cả
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(snapshot: Dict[str, Any], directory: str) -> None:
+    """Ghi snapshot của process hiện tại (atomic: file tạm rồi rename)
+
+    Flush định kỳ và scrape có thể ghi cùng lúc từ hai thread nên mỗi lần ghi
+    dùng một file tạm riêng.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(directory, os.getpid())
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def read_snapshots(directory: str) -> List[Tuple[Dict[str, Any], bool]]:
+    """Snapshot của mọi worker trong thư mục kèm cờ process còn sống"""
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith("metrics_") and filename.endswith(".json")):
+            continue
+        try:
+            pid = int(filename[len("metrics_"):-len(".json")])
+            with open(os.path.join(directory, filename)) as file:
+                snapshots.append((json.load(file), _process_alive(pid)))
+        except (ValueError, OSError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots: Iterable[Tuple[Dict[str, Any], bool]]) -> Dict[str, Any]:
+    """Cộng counter/histogram của mọi process; gauge chỉ tính process còn sống
+
+    Counter của worker đã chết được giữ lại để tổng không bị giảm.
+    """
+    merged: Dict[str, Any] = {}
+    for snapshot, alive in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    samples[key] = current + value
+    for metric in merged.values():
+        metric["samples"] = [[list(key), value] for key, value in metric["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(snapshot: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (0.0.4)"""
+    lines: List[str] = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric["labelnames"]
+        for labels, value in sorted(metric["samples"], key=lambda sample: sample[0]):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+
+            *counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_with_workers(snapshot: Dict[str, Any], directory: str) -> Dict[str, Any]:
+    """Ghi snapshot của process hiện tại rồi gộp với snapshot của các worker khác
+
+    Làm I/O file nên chạy trong threadpool; ``snapshot`` phải được lấy trên
+    thread của event loop.
+    """
+    write_snapshot(snapshot, directory)
+    return merge_snapshots(read_snapshots(directory))
+
+
+async def flush_metrics() -> None:
+    """Ghi snapshot của worker ra metrics_multiproc_dir (chạy định kỳ và khi shutdown)"""
+    if settings.metrics_multiproc_dir:
+        await anyio.to_thread.run_sync(
+            write_snapshot, registry.snapshot(), settings.metrics_multiproc_dir
+        )
@@ -1,19 +1,58 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from sqlmodel import Field
 
 
+class utcnow(FunctionElement):
+    """Thời gian hiện tại (UTC) tính phía database"""
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _compile_utcnow_postgresql(element, compiler, **kw):
+    # now() là thời điểm bắt đầu transaction: hai lần UPDATE trong cùng transaction
+    # sẽ có cùng updated_at (và cùng ETag); clock_timestamp() là thời điểm thực
+    return "clock_timestamp()"
+
+
+@compiles(utcnow, "sqlite")
+def _compile_utcnow_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP của SQLite chỉ chính xác đến giây
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
 class TimestampMixin:
     """Mixin để thêm timestamp fields cho models
 
-    Cung cấp created_at và updated_at fields với automatic timezone handling.
+    created_at và updated_at được database tự điền, nên INSERT/UPDATE ... RETURNING
+    trả về giá trị cuối cùng mà không cần refresh. Ngoài server default, cột còn
+    có default phía SQLAlchemy cùng biểu thức (chèn thẳng vào câu INSERT): bảng
+    tạo trước khi có server default (create_all không ALTER bảng đã tồn tại)
+    vẫn insert được khi INSERT không có created_at/updated_at.
     """
 
-    created_at: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc),
+    __mapper_args__ = {"eager_defaults": True}
+
+    created_at: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": utcnow(), "default": utcnow()},
         description="Thời gian tạo record"
     )
-    updated_at: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc),
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": utcnow(), "default": utcnow(), "onupdate": utcnow()},
         description="Thời gian cập nhật record lần cuối"
     )
@@ -0,0 +1,104 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable, Optional, Sequence, Tuple
+from fastapi import Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import REPLICA
+from app.core.exceptions import APIValidationError
+
+# Header chứa cursor của trang kế tiếp (keyset pagination)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Header tổng số phần tử (opt-in), kèm header báo đây là số ước lượng
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+
+
+class TotalCount(SQLModel):
+    """Schema tổng số phần tử; exact=False nghĩa là số ước lượng"""
+    count: int
+    exact: bool
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """Tạo cursor opaque từ (created_at, id) của phần tử cuối trang"""
+    raw = f"{created_at.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Giải mã cursor thành (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise APIValidationError(f"Cursor không hợp lệ: {cursor}")
+
+
+def next_cursor(items: Sequence, limit: int) -> Optional[str]:
+    """Cursor của trang kế tiếp, None nếu đây là trang cuối"""
+    if len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
+
+
+async def estimate_row_count(session: AsyncSession, table_name: str) -> Optional[int]:
+    """Số row ước lượng của planner (PostgreSQL reltuples), None nếu không có"""
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    result = await session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": table_name},
+        bind_arguments=REPLICA,
+    )
+    estimate = result.scalar()
+    # reltuples = -1 khi bảng chưa từng được VACUUM/ANALYZE
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+async def resolve_count(
+    cache: TTLCache,
+    key: Hashable,
+    count: Callable[[], Awaitable[int]],
+    estimate: Optional[Callable[[], Awaitable[Optional[int]]]] = None,
+    size_key: Optional[Hashable] = None,
+) -> TotalCount:
+    """Tổng số phần tử: ước lượng cho bảng lớn (nếu có ``estimate``), còn lại COUNT(*)
+
+    ``estimate`` chỉ nên truyền khi query không filter và client không yêu cầu
+    exact. Kết quả được cache theo ``key`` trong ``count_cache_ttl_seconds``.
+    ``size_key`` (chỉ cho query không filter) giữ số row chính xác gần nhất của
+    bảng, không phụ thuộc generation: nếu nhỏ hơn ngưỡng thì bỏ qua ước lượng và
+    chỉ chạy COUNT(*), tránh hai query cho bảng nhỏ.
+    """
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    total = None
+    if estimate is not None:
+        known = cache.get(size_key) if size_key is not None else None
+        if known is None or known >= settings.count_estimate_threshold:
+            estimated = await estimate()
+            if estimated is not None and estimated >= settings.count_estimate_threshold:
+                total = TotalCount(count=estimated, exact=False)
+    if total is None:
+        total = TotalCount(count=await count(), exact=True)
+        if size_key is not None:
+            cache.set(size_key, total.count)
+
+    cache.set(key, total)
+    return total
+
+
+def set_total_count_headers(response: Response, total: TotalCount) -> None:
+    response.headers[TOTAL_COUNT_HEADER] = str(total.count)
+    if not total.exact:
+        response.headers[TOTAL_COUNT_ESTIMATED_HEADER] = "true"
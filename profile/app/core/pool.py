@@ -0,0 +1,86 @@
+import time
+from typing import Any, Dict
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.metrics import DB_POOL_CHECKOUT_TIMEOUTS, DB_POOL_CHECKOUT_WAIT
+
+
+class PoolStats:
+    """Bộ đếm checkout của connection pool (tích lũy từ lúc khởi động)"""
+
+    __slots__ = ("checkouts", "timeouts", "wait_time_total", "wait_time_max")
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record(self, wait_time: float) -> None:
+        self.checkouts += 1
+        self.wait_time_total += wait_time
+        if wait_time > self.wait_time_max:
+            self.wait_time_max = wait_time
+
+    def as_dict(self) -> Dict[str, Any]:
+        avg = self.wait_time_total / self.checkouts if self.checkouts else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_time_total_ms": round(self.wait_time_total * 1000, 3),
+            "wait_time_avg_ms": round(avg * 1000, 3),
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool có đo thời gian chờ checkout
+
+    Thời gian đo bao gồm chờ trong queue, tạo connection mới (overflow)
+    và pre-ping nếu được bật.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # Giữ lại bộ đếm khi engine.dispose() tạo pool mới
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        wait_time = time.perf_counter() - start
+        self.stats.record(wait_time)
+        DB_POOL_CHECKOUT_WAIT.observe(wait_time)
+        return connection
+
+
+def pool_status(engine: AsyncEngine) -> Dict[str, Any]:
+    """Snapshot trạng thái pool của engine"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+
+    stats = getattr(pool, "stats", None)
+    if isinstance(stats, PoolStats):
+        status.update(stats.as_dict())
+
+    return status
@@ -0,0 +1,58 @@
+import logging
+import re
+from functools import lru_cache
+from app.core.config import settings
+from app.core.context import request_timings_var
+from app.core.logging import create_rate_limited_log
+
+logger = logging.getLogger(__name__)
+
+# Cùng một câu lệnh chậm lặp lại chỉ được log vài lần mỗi cửa sổ dedup
+_slow_query_log = create_rate_limited_log(logger)
+
+_MAX_SQL_LENGTH = 1_000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_GROUP = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=512)
+def normalize_sql(statement: str) -> str:
+    """SQL đã bỏ literal/tham số: cùng câu lệnh với giá trị khác nhau cho cùng kết quả
+
+    Literal và placeholder (?, $1, %(name)s, :name) thành ``?``, danh sách IN và
+    nhiều row VALUES được gộp thành ``(?, ...)``.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST.sub("(?, ...)", sql)
+    sql = _REPEATED_GROUP.sub(r"\1, ...", sql)
+    if len(sql) > _MAX_SQL_LENGTH:
+        sql = sql[:_MAX_SQL_LENGTH] + "..."
+    return sql
+
+
+def record_query(role: str, statement: str, duration: float) -> None:
+    """Cộng query vào request hiện tại và log nếu chậm hơn slow_query_threshold_ms
+
+    Gọi từ after_cursor_execute (app.core.metrics.instrument_engine).
+    """
+    timings = request_timings_var.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_time += duration
+
+    threshold = settings.slow_query_threshold_ms
+    duration_ms = duration * 1000
+    if threshold <= 0 or duration_ms < threshold or not logger.isEnabledFor(logging.WARNING):
+        return
+    sql = normalize_sql(statement)
+    if _slow_query_log.allow(sql):
+        logger.warning(
+            "Slow query (%s, %.1fms): %s", role, duration_ms, sql,
+            extra={"db_role": role, "duration_ms": duration_ms, "sql": sql},
+        )
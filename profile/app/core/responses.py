@@ -0,0 +1,96 @@
+import time
+from collections.abc import Mapping
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy import Row
+from app.core.context import add_serialize_time
+
+_Getters = Tuple[Tuple[str, ...], Callable[[Any], Tuple[Any, ...]], Callable[[Any], Tuple[Any, ...]]]
+_getters: Dict[Type[BaseModel], _Getters] = {}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encode bằng pydantic-core (Rust) thay vì json.dumps
+
+    Output giống JSONResponse (compact, UTF-8); NaN/Infinity thành null.
+    """
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = to_json(content, inf_nan_mode="null")
+        add_serialize_time(time.perf_counter() - start)
+        return body
+
+
+def _model_getters(model: Type[BaseModel]) -> _Getters:
+    getters = _getters.get(model)
+    if getters is None:
+        names = tuple(model.model_fields)
+        # attrgetter/itemgetter với một tên trả về giá trị đơn, không phải tuple
+        getters = (
+            names,
+            attrgetter(*names) if len(names) > 1 else lambda obj: (getattr(obj, names[0]),),
+            itemgetter(*names) if len(names) > 1 else lambda obj: (obj[names[0]],),
+        )
+        _getters[model] = getters
+    return getters
+
+
+def _public_dict(obj: Any, getters: _Getters) -> Dict[str, Any]:
+    names, by_attr, by_key = getters
+    return dict(zip(names, by_key(obj) if isinstance(obj, Mapping) else by_attr(obj)))
+
+
+def public_dicts(items: Sequence[Any], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Các dict field public của một list object cùng kiểu (ORM, RowMapping hoặc Row)"""
+    getters = _model_getters(model)
+    names = getters[0]
+    if items and isinstance(items[0], Row) and items[0]._fields == names:
+        # Projection đúng các cột public theo thứ tự field: zip thẳng tuple,
+        # tránh truy cập thuộc tính của Row (chậm hơn nhiều so với index)
+        return [dict(zip(names, row)) for row in items]
+    return [_public_dict(obj, getters) for obj in items]
+
+
+def public_json(content: Union[Any, Sequence[Any]], model: Type[BaseModel]) -> bytes:
+    """Serialize ORM object/RowMapping/Row (hoặc list) theo các field của schema public
+
+    Chỉ dùng cho dữ liệu tin cậy đọc từ DB: bỏ qua bước validate (from_attributes)
+    rồi dump của response_model, chỉ lấy đúng các field của ``model`` rồi encode
+    thẳng ra bytes. Kết quả giống ``model.model_validate(obj).model_dump_json()``.
+    """
+    start = time.perf_counter()
+    if isinstance(content, (list, tuple)) and not isinstance(content, Row):
+        body = to_json(public_dicts(content, model))
+    else:
+        body = to_json(_public_dict(content, _model_getters(model)))
+    add_serialize_time(time.perf_counter() - start)
+    return body
+
+
+def public_response(
+    content: Union[Any, Sequence[Any]],
+    model: Type[BaseModel],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+    response: Optional[Response] = None,
+) -> Response:
+    """Response JSON từ public_json (FastAPI không validate lại response_model)
+
+    ``response`` là sub-response được inject vào handler/dependency: khi handler trả
+    về Response, FastAPI không merge header/cookie đã set trên nó (ví dụ cookie
+    read-your-writes của RoutingSession), nên phải copy sang response trả về.
+    """
+    result = Response(
+        public_json(content, model),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
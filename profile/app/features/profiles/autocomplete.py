@@ -0,0 +1,122 @@
+from bisect import bisect_left
+from typing import Iterable, List
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlmodel import select
+from app.features.profiles.availability import (
+    begin_username_filter_rebuild,
+    load_username_filter,
+)
+from app.features.profiles.model import Profile
+
+
+class UsernameIndex:
+    """Index username trong bộ nhớ cho autocomplete theo prefix (không phân biệt hoa thường)
+
+    Lưu hai list song song được sắp xếp theo (username.lower(), username) thay vì trie
+    (dict mỗi node): tra prefix bằng bisect O(log n + k), bộ nhớ chỉ là các string.
+    Index nằm trong từng process, nên chỉ thấy các thay đổi do chính worker đó ghi
+    cho tới lần build kế tiếp.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[str] = []
+        self._names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def _key(username: str) -> str:
+        key = username.lower()
+        # Dùng chung object string khi username vốn đã là chữ thường
+        return username if key == username else key
+
+    def _position(self, username: str) -> int:
+        key = self._key(username)
+        index = bisect_left(self._keys, key)
+        while (
+            index < len(self._keys)
+            and self._keys[index] == key
+            and self._names[index] < username
+        ):
+            index += 1
+        return index
+
+    def load(self, usernames: Iterable[str]) -> None:
+        """Build lại toàn bộ index"""
+        pairs = sorted((self._key(name), name) for name in usernames)
+        self._keys = [key for key, _ in pairs]
+        self._names = [name for _, name in pairs]
+
+    def add(self, username: str) -> None:
+        index = self._position(username)
+        if index < len(self._names) and self._names[index] == username:
+            return
+        self._keys.insert(index, self._key(username))
+        self._names.insert(index, username)
+
+    def add_many(self, usernames: Iterable[str]) -> None:
+        """Thêm nhiều username (import): merge một lần thay vì chèn từng phần tử
+
+        Chỉ sort các username mới; list cũ được copy theo từng đoạn giữa các vị
+        trí chèn (O(n + k log n), không sort lại toàn bộ index).
+        """
+        pairs = sorted({(self._key(name), name) for name in usernames})
+        keys: List[str] = []
+        names: List[str] = []
+        previous = 0
+        for key, name in pairs:
+            index = self._position(name)
+            if index < len(self._names) and self._names[index] == name:
+                continue
+            keys += self._keys[previous:index]
+            names += self._names[previous:index]
+            keys.append(key)
+            names.append(name)
+            previous = index
+        if not names:
+            return
+        keys += self._keys[previous:]
+        names += self._names[previous:]
+        self._keys = keys
+        self._names = names
+
+    def remove(self, username: str) -> None:
+        index = self._position(username)
+        if index < len(self._names) and self._names[index] == username:
+            del self._keys[index]
+            del self._names[index]
+
+    def rename(self, old_username: str, new_username: str) -> None:
+        self.remove(old_username)
+        self.add(new_username)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Các username bắt đầu bằng prefix, theo thứ tự alphabet"""
+        key = prefix.lower()
+        index = bisect_left(self._keys, key)
+        end = min(index + limit, len(self._keys))
+
+        results = []
+        while index < end and self._keys[index].startswith(key):
+            results.append(self._names[index])
+            index += 1
+        return results
+
+
+username_index = UsernameIndex()
+
+
+async def build_username_indexes(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    """Build autocomplete index và Bloom filter username từ bảng Profile
+
+    Chạy lúc startup và định kỳ (username_filter_rebuild_seconds).
+    """
+    begin_username_filter_rebuild()
+    async with session_maker() as session:
+        result = await session.stream_scalars(
+            select(Profile.username).execution_options(yield_per=10_000)
+        )
+        usernames = [username async for username in result]
+    username_index.load(usernames)
+    load_username_filter(usernames)
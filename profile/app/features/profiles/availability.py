@@ -0,0 +1,53 @@
+from typing import Iterable, List, Optional
+from app.core.bloom import CountingBloomFilter
+from app.core.config import settings
+
+# Bloom filter các username đã tồn tại. Filter nằm trong từng process và chỉ
+# biết username đã load lúc build hoặc do chính process này ghi: username do
+# worker/instance khác hoặc ghi thẳng vào DB tạo ra chưa có trong filter cho tới
+# lần rebuild sau. Vì vậy "không có trong filter" chỉ được tin khi filter là
+# nguồn duy nhất (username_filter_authoritative), còn lại vẫn phải hỏi DB.
+username_filter = CountingBloomFilter(
+    settings.username_filter_capacity, settings.username_filter_error_rate
+)
+
+# Username được add trong lúc đang rebuild (None khi không rebuild): snapshot đọc
+# từ DB có thể không chứa chúng nên được add lại sau khi load
+_added_during_rebuild: Optional[List[str]] = None
+
+
+def add_username(username: str) -> None:
+    username_filter.add(username)
+    if _added_during_rebuild is not None:
+        _added_during_rebuild.append(username)
+
+
+def remove_username(username: str) -> None:
+    username_filter.remove(username)
+
+
+def username_definitely_free(username: str) -> bool:
+    """True nếu có thể trả lời "còn trống" mà không query DB"""
+    return settings.username_filter_authoritative and username not in username_filter
+
+
+def begin_username_filter_rebuild() -> None:
+    """Gọi trước khi đọc danh sách username từ DB để rebuild"""
+    global _added_during_rebuild
+    _added_during_rebuild = []
+
+
+def load_username_filter(usernames: Iterable[str]) -> None:
+    """Build lại filter, capacity gấp đôi số username hiện có để còn chỗ tăng trưởng
+
+    Chạy lúc startup và định kỳ (username_filter_rebuild_seconds) nên capacity
+    tăng theo bảng và username do process khác tạo được cập nhật.
+    """
+    global _added_during_rebuild
+    usernames = list(usernames)
+    username_filter.load(
+        usernames, capacity=max(settings.username_filter_capacity, 2 * len(usernames))
+    )
+    for username in _added_during_rebuild or ():
+        username_filter.add(username)
+    _added_during_rebuild = None
@@ -1,4 +1,5 @@
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 from app.core.mixins import TimestampMixin
 
@@ -14,4 +15,9 @@ class ProfileBase(SQLModel):
 
 class Profile(ProfileBase, TimestampMixin, table=True):
     """Database model cho Profile"""
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC
+        Index("ix_profile_created_at_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -1,8 +1,23 @@
-from typing import List, Optional
-from datetime import datetime, timezone
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple
+from sqlalchemy import Row, delete, exists, func, insert, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlmodel import select
+from app.core.config import settings
+from app.core.database import REPLICA
+from app.core.mixins import utcnow
+from app.core.pagination import estimate_row_count
 from app.features.profiles.model import Profile
+from app.features.profiles.schemas import ProfilePublic
+from app.features.profiles import search
+
+# Các cột do database tự sinh, không đưa vào INSERT
+_SERVER_GENERATED = {"id", "created_at", "updated_at"}
+
+# Cột theo thứ tự field của ProfilePublic: danh sách/tìm kiếm chỉ đọc thành Row,
+# không tạo ORM instance và không qua identity map
+_PUBLIC_COLUMNS = tuple(Profile.__table__.c[name] for name in ProfilePublic.model_fields)
 
 
 class ProfileRepository:
@@ -10,22 +25,88 @@ class ProfileRepository:
         self.session = session
 
     async def create(self, profile: Profile) -> Profile:
-        """Tạo profile mới"""
-        self.session.add(profile)
-        await self.session.commit()
-        await self.session.refresh(profile)
-        return profile
+        """Tạo profile mới (INSERT ... RETURNING)"""
+        statement = (
+            insert(Profile)
+            .values(**profile.model_dump(exclude=_SERVER_GENERATED))
+            .returning(Profile)
+        )
+        result = await self.session.execute(statement)
+        return result.scalars().one()
+
+    async def upsert_many(
+        self,
+        values: List[Dict[str, Any]],
+        update_columns: Optional[Collection[str]] = None
+    ) -> List[Row]:
+        """INSERT nhiều profile với ON CONFLICT (username) DO NOTHING / DO UPDATE, chia theo chunk
+
+        ``update_columns`` None: DO NOTHING; ngược lại DO UPDATE chỉ các cột này
+        (các cột khác của row đã có giữ nguyên). Trả về (id, username) của các row
+        thực sự được insert hoặc update; với DO NOTHING, row trùng username không
+        có trong kết quả.
+        """
+        dialect_insert = (
+            postgresql.insert
+            if self.session.get_bind().dialect.name == "postgresql"
+            else sqlite.insert
+        )
+        table = Profile.__table__
+        statement = dialect_insert(table)
+        if update_columns is not None:
+            columns = set(update_columns) - {"username"}
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.username],
+                # ON CONFLICT DO UPDATE không áp dụng onupdate của cột
+                set_={**{name: statement.excluded[name] for name in columns}, "updated_at": utcnow()},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[table.c.username])
+        statement = statement.returning(table.c.id, table.c.username)
+        chunk_size = settings.bulk_insert_chunk_size
+
+        rows: List[Row] = []
+        for start in range(0, len(values), chunk_size):
+            result = await self.session.execute(statement, values[start:start + chunk_size])
+            rows.extend(result.all())
+        return rows
+
+    async def existing_usernames(self, usernames: List[str]) -> Set[str]:
+        """Các username trong danh sách đã tồn tại (đọc từ primary)"""
+        statement = select(Profile.username).where(Profile.username.in_(usernames))
+        result = await self.session.execute(statement)
+        return set(result.scalars().all())
 
     async def get_by_id(self, profile_id: int) -> Optional[Profile]:
         """Lấy profile theo ID"""
-        return await self.session.get(Profile, profile_id)
+        statement = select(Profile).where(Profile.id == profile_id)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.scalars().first()
 
     async def get_by_username(self, username: str) -> Optional[Profile]:
         """Lấy profile theo username (exact match)"""
         statement = select(Profile).where(Profile.username == username)
-        result = await self.session.execute(statement)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
         return result.scalars().first()
 
+    async def get_version(self, profile_id: int) -> Optional[Row]:
+        """(id, updated_at) của profile, dùng cho ETag mà không load cả row"""
+        statement = select(Profile.id, Profile.updated_at).where(Profile.id == profile_id)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.first()
+
+    async def get_version_by_username(self, username: str) -> Optional[Row]:
+        """(id, updated_at) của profile theo username"""
+        statement = select(Profile.id, Profile.updated_at).where(Profile.username == username)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.first()
+
+    async def get_username(self, profile_id: int) -> Optional[str]:
+        """Lấy username hiện tại của profile (đọc từ primary)"""
+        statement = select(Profile.username).where(Profile.id == profile_id)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
     async def username_exists(self, username: str, exclude_id: Optional[int] = None) -> bool:
         """Kiểm tra username đã tồn tại chưa
 
@@ -36,50 +117,102 @@ class ProfileRepository:
         Returns:
             True nếu username đã tồn tại, False nếu chưa
         """
-        statement = select(Profile).where(Profile.username == username)
+        # SELECT EXISTS(...): chỉ cần unique index của username, không load row
+        condition = exists().where(Profile.username == username)
 
         if exclude_id is not None:
-            statement = statement.where(Profile.id != exclude_id)
+            condition = condition.where(Profile.id != exclude_id)
 
-        result = await self.session.execute(statement)
-        return result.scalars().first() is not None
+        result = await self.session.execute(select(condition))
+        return bool(result.scalar())
 
     async def search_by_username(
         self,
         username_query: str,
         skip: int = 0,
         limit: int = 100
-    ) -> List[Profile]:
-        """Tìm profile theo username (partial match, case-insensitive)"""
-        statement = select(Profile).where(
-            Profile.username.ilike(f"%{username_query}%")
-        )
-        statement = statement.offset(skip).limit(limit).order_by(Profile.username)
+    ) -> List[Row]:
+        """Tìm profile theo username (partial match, case-insensitive)
 
-        result = await self.session.execute(statement)
-        return list(result.scalars().all())
+        Dùng index trigram theo dialect (pg_trgm trên PostgreSQL, FTS5 trên SQLite).
+        Kết quả xếp hạng: exact > prefix > substring, sau đó theo username.
+        Trả về Row gồm các cột của ProfilePublic.
+        """
+        bind = self.session.get_bind()
+        statement = select(*_PUBLIC_COLUMNS)
+
+        if (
+            bind.dialect.name == "sqlite"
+            and len(username_query) >= search.MIN_INDEXED_QUERY_LENGTH
+            and search.has_fts(str(bind.url))
+        ):
+            statement = statement.where(search.fts_match(username_query))
+        else:
+            # PostgreSQL: ILIKE dùng được GIN trigram index
+            statement = statement.where(
+                Profile.username.ilike(f"%{search.escape_like(username_query)}%", escape="\\")
+            )
+
+        statement = statement.order_by(
+            search.match_rank(username_query), Profile.username
+        ).offset(skip).limit(limit)
+
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return list(result.all())
 
     async def get_all(
         self,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[Profile]:
-        """Lấy tất cả profiles với phân trang"""
-        statement = select(Profile)
-        statement = statement.offset(skip).limit(limit).order_by(Profile.created_at.desc())
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Row]:
+        """Lấy tất cả profiles với phân trang (offset hoặc keyset với after=(created_at, id))
+
+        Chỉ đọc (Core projection): trả về Row gồm các cột của ProfilePublic.
+        """
+        statement = select(*_PUBLIC_COLUMNS)
+
+        if after is not None:
+            statement = statement.where(tuple_(Profile.created_at, Profile.id) < after)
+
+        statement = statement.offset(skip).limit(limit).order_by(
+            Profile.created_at.desc(), Profile.id.desc()
+        )
+
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return list(result.all())
+
+    async def count(self) -> int:
+        """COUNT(*) chính xác"""
+        result = await self.session.execute(
+            select(func.count()).select_from(Profile), bind_arguments=REPLICA
+        )
+        return result.scalar_one()
+
+    async def estimate_count(self) -> Optional[int]:
+        """Số profile ước lượng từ thống kê của planner (chỉ PostgreSQL)"""
+        return await estimate_row_count(self.session, Profile.__tablename__)
+
+    async def stream_all(self) -> AsyncResult:
+        """Mở server-side cursor trên profiles (theo id) cho export, caller phải close result"""
+        statement = select(*Profile.__table__.c).order_by(Profile.id).execution_options(
+            yield_per=settings.export_fetch_size
+        )
+        return await self.session.stream(statement, bind_arguments=REPLICA)
+
+    async def update(self, profile_id: int, values: Dict[str, Any]) -> Optional[Profile]:
+        """Cập nhật profile (UPDATE ... RETURNING), trả về None nếu không tìm thấy"""
+        statement = (
+            update(Profile)
+            .where(Profile.id == profile_id)
+            .values(**values, updated_at=utcnow())
+            .returning(Profile)
+        )
+        result = await self.session.execute(statement)
+        return result.scalars().first()
 
+    async def delete(self, profile_id: int) -> Optional[str]:
+        """Xóa profile (DELETE ... RETURNING username), trả về None nếu không tìm thấy"""
+        statement = delete(Profile).where(Profile.id == profile_id).returning(Profile.username)
         result = await self.session.execute(statement)
-        return list(result.scalars().all())
-
-    async def update(self, profile: Profile) -> Profile:
-        """Cập nhật profile"""
-        profile.updated_at = datetime.now(timezone.utc)
-        self.session.add(profile)
-        await self.session.commit()
-        await self.session.refresh(profile)
-        return profile
-
-    async def delete(self, profile: Profile) -> None:
-        """Xóa profile"""
-        await self.session.delete(profile)
-        await self.session.commit()
+        return result.scalar_one_or_none()
@@ -1,21 +1,58 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_session
-from app.features.profiles.schemas import ProfileCreate, ProfileUpdate, ProfilePublic
+from app.core.conditional import (
+    Validators,
+    cached_response,
+    conditional_get,
+    not_modified,
+    not_modified_response,
+    page_etag,
+)
+from app.core.database import get_batch_session, get_session
+from app.core.exceptions import APIValidationError
+from app.core.export import EXPORT_MEDIA_TYPES, ExportFormat, export_headers
+from app.core.imports import ConflictAction, ImportReport
+from app.core.pagination import TotalCount, set_total_count_headers
+from app.core.responses import public_response
+from app.features.profiles.autocomplete import username_index
+from app.features.profiles.schemas import (
+    ProfileCreate,
+    ProfileUpdate,
+    ProfilePublic,
+    UsernameAvailability,
+)
 from app.features.profiles.service import ProfileService
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
 
-def get_profile_service(session: AsyncSession = Depends(get_session)) -> ProfileService:
+def get_profile_service(
+    session: AsyncSession = Depends(get_session, scope="function"),
+) -> ProfileService:
     """Dependency để inject ProfileService"""
     return ProfileService(session)
 
 
+def get_profile_export_service(
+    session: AsyncSession = Depends(get_session, scope="request"),
+) -> ProfileService:
+    """Session sống tới khi stream response kết thúc (không đóng ngay sau handler)"""
+    return ProfileService(session)
+
+
+def get_profile_import_service(
+    session: AsyncSession = Depends(get_batch_session),
+) -> ProfileService:
+    """Service import: mỗi batch được commit riêng"""
+    return ProfileService(session)
+
+
 @router.post("/", response_model=ProfilePublic, status_code=201)
 async def create_profile(
     profile_data: ProfileCreate,
+    response: Response,
     service: ProfileService = Depends(get_profile_service)
 ):
     """Tạo profile mới
@@ -26,50 +63,165 @@ async def create_profile(
     - Avatar URL: phải là valid URL nếu provided
     - Birthdate: format YYYY-MM-DD, không phải future date
     """
-    return await service.create_profile(profile_data)
+    return public_response(
+        await service.create_profile(profile_data),
+        ProfilePublic,
+        status_code=201,
+        response=response,
+    )
+
+
+@router.post(
+    "/import",
+    response_model=ImportReport,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def import_profiles(
+    request: Request,
+    on_conflict: ConflictAction = Query(
+        ConflictAction.skip, description="Username đã tồn tại: skip (bỏ qua) hoặc update (ghi đè)"
+    ),
+    service: ProfileService = Depends(get_profile_import_service)
+):
+    """Import profiles từ body NDJSON (mỗi dòng một ProfileCreate), đọc và insert theo batch
+
+    Mỗi batch được commit riêng. Trả về số dòng inserted/updated/skipped/failed
+    kèm lỗi theo từng dòng.
+    """
+    return await service.import_profiles(request.stream(), on_conflict)
 
 
 @router.get("/", response_model=List[ProfilePublic])
 async def get_profiles(
+    request: Request,
     skip: int = Query(0, ge=0, description="Số profiles để skip (pagination)"),
     limit: int = Query(100, ge=1, le=100, description="Số profiles tối đa trả về"),
     username: Optional[str] = Query(None, description="Tìm kiếm theo username (partial match)"),
+    cursor: Optional[str] = Query(None, description="Cursor từ header X-Next-Cursor (keyset pagination)"),
+    include_total: bool = Query(False, description="Trả về header X-Total-Count (danh sách mặc định)"),
+    exact: bool = Query(False, description="X-Total-Count chính xác (COUNT(*)) thay vì ước lượng"),
     service: ProfileService = Depends(get_profile_service)
 ):
     """Lấy danh sách profiles với phân trang và tìm kiếm
 
     - Nếu không có filter: trả về tất cả profiles (mới nhất trước)
     - Nếu có username: tìm kiếm theo username (case-insensitive, partial match)
+    - Trang kế tiếp của danh sách mặc định: truyền header X-Next-Cursor vào `cursor`
+    - ETag là hash của (id, updated_at) các phần tử; khớp If-None-Match thì trả 304
+    - Danh sách mặc định được cache theo tham số query, mọi lần ghi profile làm mới cache
+    - include_total: header X-Total-Count cho danh sách mặc định
     """
-    return await service.search_profiles(
+    if not username:
+        page = await service.get_profiles_page(skip=skip, limit=limit, cursor=cursor)
+        page_response = cached_response(request, page)
+        if include_total:
+            set_total_count_headers(page_response, await service.count_profiles(exact))
+        return page_response
+
+    if include_total:
+        raise APIValidationError(
+            "include_total chỉ dùng cho danh sách mặc định (không có username)"
+        )
+
+    profiles = await service.search_profiles(
         username_query=username,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=cursor
     )
+    validators = Validators(page_etag((profile.id, profile.updated_at) for profile in profiles))
+    if not_modified(request, validators):
+        return not_modified_response(validators)
+
+    return public_response(profiles, ProfilePublic, headers={"ETag": validators.etag})
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_profiles(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    service: ProfileService = Depends(get_profile_export_service)
+):
+    """Export toàn bộ profiles dạng NDJSON hoặc CSV, stream theo batch từ server-side cursor"""
+    return StreamingResponse(
+        service.export_profiles(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers("profiles", format),
+    )
+
+
+@router.get("/count", response_model=TotalCount)
+async def count_profiles(
+    exact: bool = Query(False, description="Luôn dùng COUNT(*) thay vì ước lượng cho bảng lớn"),
+    service: ProfileService = Depends(get_profile_service)
+):
+    """Tổng số profiles (ước lượng khi bảng lớn, exact=true để đếm chính xác)"""
+    return await service.count_profiles(exact=exact)
+
+
+@router.get("/suggest", response_model=List[str])
+async def suggest_usernames(
+    prefix: str = Query(..., min_length=1, max_length=50, description="Prefix của username"),
+    limit: int = Query(10, ge=1, le=50, description="Số gợi ý tối đa"),
+):
+    """Gợi ý username theo prefix (autocomplete, case-insensitive)
+
+    Đọc từ index trong bộ nhớ nên không mở session/connection database.
+    """
+    return username_index.suggest(prefix, limit)
+
+
+@router.get("/username-available", response_model=UsernameAvailability)
+async def check_username_available(
+    username: str = Query(..., description="Username cần kiểm tra"),
+    service: ProfileService = Depends(get_profile_service)
+):
+    """Kiểm tra username còn trống không (validate format như khi tạo profile)
+
+    Với USERNAME_FILTER_AUTHORITATIVE, phần lớn username trống được trả lời từ
+    Bloom filter mà không chạm database.
+    """
+    available = await service.check_username_availability(username)
+    return UsernameAvailability(username=username, available=available)
 
 
 @router.get("/{profile_id}", response_model=ProfilePublic)
 async def get_profile(
     profile_id: int,
+    request: Request,
     service: ProfileService = Depends(get_profile_service)
 ):
-    """Lấy thông tin chi tiết profile theo ID"""
-    return await service.get_profile_by_id(profile_id)
+    """Lấy thông tin chi tiết profile theo ID (read-through cache, ETag/Last-Modified, 304)"""
+    return await conditional_get(
+        request,
+        lambda: service.get_profile_validators_by_id(profile_id),
+        lambda cache_checked: service.get_profile_json_by_id(profile_id, cache_checked),
+    )
 
 
 @router.get("/by-username/{username}", response_model=ProfilePublic)
 async def get_profile_by_username(
     username: str,
+    request: Request,
     service: ProfileService = Depends(get_profile_service)
 ):
-    """Lấy profile theo username (exact match)"""
-    return await service.get_profile_by_username(username)
+    """Lấy profile theo username (exact match, read-through cache, ETag/Last-Modified, 304)"""
+    return await conditional_get(
+        request,
+        lambda: service.get_profile_validators_by_username(username),
+        lambda cache_checked: service.get_profile_json_by_username(username, cache_checked),
+    )
 
 
 @router.patch("/{profile_id}", response_model=ProfilePublic)
 async def update_profile(
     profile_id: int,
     profile_data: ProfileUpdate,
+    response: Response,
     service: ProfileService = Depends(get_profile_service)
 ):
     """Cập nhật thông tin profile
@@ -78,7 +230,9 @@ async def update_profile(
     - Username: phải unique nếu thay đổi
     - Tất cả validations tương tự create
     """
-    return await service.update_profile(profile_id, profile_data)
+    return public_response(
+        await service.update_profile(profile_id, profile_data), ProfilePublic, response=response
+    )
 
 
 @router.delete("/{profile_id}", status_code=204)
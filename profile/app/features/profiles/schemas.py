@@ -23,3 +23,9 @@ class ProfilePublic(ProfileBase):
     id: int
     created_at: datetime
     updated_at: datetime
+
+
+class UsernameAvailability(SQLModel):
+    """Schema kết quả kiểm tra username còn trống"""
+    username: str
+    available: bool
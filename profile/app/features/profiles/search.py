@@ -0,0 +1,109 @@
+import logging
+from typing import Set
+from sqlalchemy import Connection, case, column, event, func, select, table, text
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import SQLModel
+from app.features.profiles.model import Profile
+
+logger = logging.getLogger(__name__)
+
+# Index trigram cho tìm kiếm substring username:
+# - PostgreSQL: pg_trgm GIN index, dùng trực tiếp cho ILIKE '%q%'
+# - SQLite: bảng FTS5 (tokenizer trigram) đồng bộ với bảng profile qua trigger
+TRGM_INDEX = "ix_profile_username_trgm"
+FTS_TABLE = "profile_username_fts"
+
+# Trigram cần tối thiểu 3 ký tự, query ngắn hơn phải scan
+MIN_INDEXED_QUERY_LENGTH = 3
+
+# Các database (theo URL) đã có bảng FTS5
+_fts_databases: Set[str] = set()
+
+fts_table = table(FTS_TABLE, column("rowid"), column("username"))
+
+
+def escape_like(value: str) -> str:
+    """Escape ký tự đặc biệt của LIKE (dùng với escape='\\')"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def match_rank(username_query: str) -> ColumnElement:
+    """Thứ hạng kết quả: exact (0) > prefix (1) > substring (2)"""
+    lowered = func.lower(Profile.username)
+    query = username_query.lower()
+    return case(
+        (lowered == query, 0),
+        (lowered.like(f"{escape_like(query)}%", escape="\\"), 1),
+        else_=2,
+    )
+
+
+def has_fts(database_url: str) -> bool:
+    return database_url in _fts_databases
+
+
+def fts_match(username_query: str) -> ColumnElement:
+    """Điều kiện Profile.id nằm trong kết quả MATCH của bảng FTS5"""
+    phrase = '"' + username_query.replace('"', '""') + '"'
+    return Profile.id.in_(
+        select(fts_table.c.rowid).where(text(f"{FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase))
+    )
+
+
+def _create_postgresql_index(connection: Connection) -> None:
+    try:
+        # Savepoint để lỗi quyền (CREATE EXTENSION) không làm hỏng transaction create_all
+        with connection.begin_nested():
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} "
+                "ON profile USING gin (username gin_trgm_ops)"
+            )
+    except Exception as e:
+        logger.warning("Cannot create pg_trgm index, username search will scan: %s", e)
+
+
+def _create_sqlite_fts(connection: Connection) -> None:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first()
+
+    if not exists:
+        try:
+            with connection.begin_nested():
+                connection.exec_driver_sql(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "username, content='profile', content_rowid='id', tokenize='trigram')"
+                )
+                connection.exec_driver_sql(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+                )
+        except Exception as e:
+            logger.warning("SQLite FTS5 trigram unavailable, username search will scan: %s", e)
+            return
+
+    # Trigger giữ bảng FTS (external content) đồng bộ với profile
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON profile BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, username) VALUES (new.id, new.username); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON profile BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username) "
+        f"VALUES ('delete', old.id, old.username); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF username ON profile BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, username) "
+        f"VALUES ('delete', old.id, old.username); "
+        f"INSERT INTO {FTS_TABLE}(rowid, username) VALUES (new.id, new.username); END",
+    ):
+        connection.exec_driver_sql(statement)
+
+    _fts_databases.add(str(connection.engine.url))
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_username_search_indexes(target, connection: Connection, **kw) -> None:
+    """Tạo index tìm kiếm username theo dialect (chạy sau mỗi lần create_all)"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        _create_postgresql_index(connection)
+    elif dialect == "sqlite":
+        _create_sqlite_fts(connection)
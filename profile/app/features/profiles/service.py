@@ -1,16 +1,48 @@
 import re
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy import Row
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.features.profiles.model import Profile
-from app.features.profiles.schemas import ProfileCreate, ProfileUpdate
+from app.features.profiles.schemas import ProfileCreate, ProfileUpdate, ProfilePublic
 from app.features.profiles.repository import ProfileRepository
+from app.features.profiles.autocomplete import username_index
+from app.features.profiles.availability import (
+    add_username,
+    remove_username,
+    username_definitely_free,
+)
+from app.core.cache import (
+    CachedResponse,
+    create_cache,
+    create_ttl_cache,
+    invalidate_on_commit,
+    prefer_primary_after_invalidation,
+)
+from app.core.config import settings
+from app.core.conditional import Validators, page_response, resource_validators
+from app.core.database import after_commit
+from app.core.export import ExportFormat, export_chunks
+from app.core.imports import ConflictAction, ImportReport, iter_ndjson_lines
 from app.core.exceptions import NotFoundError, ConflictError, APIValidationError
+from app.core.pagination import TotalCount, decode_cursor, resolve_count
+from app.core.responses import public_json
+
+# Cache JSON của ProfilePublic theo ("id", id) và ("username", username)
+profile_cache = create_cache("profiles")
+
+# Cache các trang của danh sách mặc định, key gắn generation (xem ResponseCache)
+profile_list_cache = create_cache("profile_lists")
+
+# Cache kết quả count ngắn hạn, key gắn generation của profile_list_cache
+profile_count_cache = create_ttl_cache(settings.count_cache_ttl_seconds)
 
 
 class ProfileService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repository = ProfileRepository(session)
 
     def _validate_username(self, username: str) -> None:
@@ -79,7 +111,7 @@ class ProfileService:
         self._validate_avatar_url(profile_data.avatar_url)
 
         # Check username uniqueness
-        if await self.repository.username_exists(profile_data.username):
+        if not await self.is_username_available(profile_data.username):
             raise ConflictError(
                 f"Username '{profile_data.username}' đã được sử dụng"
             )
@@ -94,13 +126,149 @@ class ProfileService:
         )
 
         try:
-            return await self.repository.create(profile)
+            created = await self.repository.create(profile)
         except IntegrityError:
             # Fallback check trong case có race condition
             raise ConflictError(
                 f"Username '{profile_data.username}' đã được sử dụng"
             )
 
+        # Thêm vào filter ngay (false positive nếu rollback thì vô hại), còn
+        # autocomplete index chỉ cập nhật khi transaction commit
+        add_username(created.username)
+        after_commit(self.session, lambda: username_index.add(created.username))
+        invalidate_on_commit(self.session, profile_list_cache)
+        return created
+
+    async def import_profiles(
+        self,
+        chunks: AsyncIterator[bytes],
+        on_conflict: ConflictAction = ConflictAction.skip
+    ) -> ImportReport:
+        """Import profiles từ body NDJSON (mỗi dòng một ProfileCreate)
+
+        Dòng được validate như create_profile rồi insert theo batch bằng
+        INSERT ... ON CONFLICT (username), không query username_exists từng dòng.
+        Dòng lỗi/bị bỏ qua được ghi vào report thay vì làm hỏng cả request.
+
+        Mỗi batch được commit riêng (session không nằm trong transaction của
+        request, xem get_batch_session): trong lúc chờ đọc body từ client không
+        giữ connection/transaction nào, bộ nhớ chỉ phụ thuộc kích thước batch.
+        Nếu import dừng giữa chừng, các batch đã commit được giữ lại.
+        """
+        report = ImportReport()
+        batch: List[Tuple[int, ProfileCreate]] = []
+
+        async for line_no, line in iter_ndjson_lines(chunks, settings.import_max_line_bytes):
+            if line is None:
+                report.fail(line_no, f"Dòng vượt quá {settings.import_max_line_bytes} bytes")
+                continue
+            try:
+                profile_data = ProfileCreate.model_validate_json(line)
+                self._validate_username(profile_data.username)
+                self._validate_birthdate(profile_data.birthdate)
+                self._validate_avatar_url(profile_data.avatar_url)
+            except ValidationError as exc:
+                error = exc.errors(include_url=False)[0]
+                location = ".".join(str(part) for part in error["loc"])
+                report.fail(line_no, f"{location}: {error['msg']}" if location else error["msg"])
+                continue
+            except APIValidationError as exc:
+                report.fail(line_no, exc.detail)
+                continue
+
+            batch.append((line_no, profile_data))
+            if len(batch) >= settings.import_batch_size:
+                await self._import_batch(batch, on_conflict, report)
+                batch = []
+
+        if batch:
+            await self._import_batch(batch, on_conflict, report)
+        return report
+
+    async def _import_batch(
+        self,
+        batch: List[Tuple[int, ProfileCreate]],
+        on_conflict: ConflictAction,
+        report: ImportReport
+    ) -> None:
+        """Insert một batch đã validate rồi commit"""
+        update = on_conflict is ConflictAction.update
+
+        # Username lặp lại trong cùng batch: skip giữ dòng đầu, update giữ dòng cuối
+        lines: Dict[str, Tuple[int, ProfileCreate]] = {}
+        for line_no, profile_data in batch:
+            username = profile_data.username
+            previous = lines.get(username)
+            if previous is None:
+                lines[username] = (line_no, profile_data)
+            elif update:
+                report.skip(previous[0], f"Username '{username}' bị ghi đè bởi dòng {line_no}")
+                lines[username] = (line_no, profile_data)
+            else:
+                report.skip(line_no, f"Username '{username}' trùng với dòng {previous[0]}")
+
+        if update:
+            existing = await self.repository.existing_usernames(list(lines))
+            # Dòng chỉ ghi đè các field có trong dòng: gom theo tập field để mỗi
+            # nhóm là một câu upsert với DO UPDATE SET đúng các cột đó
+            groups: Dict[FrozenSet[str], List[Dict[str, Any]]] = {}
+            for _, profile_data in lines.values():
+                groups.setdefault(frozenset(profile_data.model_fields_set), []).append(
+                    profile_data.model_dump()
+                )
+            rows = []
+            for columns, values in groups.items():
+                rows.extend(await self.repository.upsert_many(values, update_columns=columns))
+        else:
+            existing = set()
+            rows = await self.repository.upsert_many(
+                [profile_data.model_dump() for _, profile_data in lines.values()]
+            )
+
+        written = {row.username for row in rows}
+        created = [username for username in written if username not in existing]
+        report.inserted += len(created)
+        report.updated += len(written) - len(created)
+        for username, (line_no, _) in lines.items():
+            if username not in written:
+                report.skip(line_no, f"Username '{username}' đã được sử dụng")
+
+        if existing:
+            invalidate_on_commit(
+                self.session,
+                profile_cache,
+                *(("id", row.id) for row in rows if row.username in existing),
+                *(("username", username) for username in existing),
+            )
+        if written:
+            invalidate_on_commit(self.session, profile_list_cache)
+        for username in created:
+            add_username(username)
+        if created:
+            after_commit(self.session, lambda: username_index.add_many(created))
+        await self.session.commit()
+
+    async def is_username_available(
+        self,
+        username: str,
+        exclude_id: Optional[int] = None
+    ) -> bool:
+        """Username còn trống không
+
+        Khi filter là nguồn tin cậy (username_filter_authoritative), username
+        không có trong Bloom filter được trả lời "trống" mà không query DB; các
+        trường hợp còn lại chạy EXISTS trên unique index.
+        """
+        if username_definitely_free(username):
+            return True
+        return not await self.repository.username_exists(username, exclude_id=exclude_id)
+
+    async def check_username_availability(self, username: str) -> bool:
+        """Validate format rồi kiểm tra username còn trống (cho endpoint availability)"""
+        self._validate_username(username)
+        return await self.is_username_available(username)
+
     async def get_profile_by_id(self, profile_id: int) -> Profile:
         """Lấy profile theo ID"""
         profile = await self.repository.get_by_id(profile_id)
@@ -115,21 +283,127 @@ class ProfileService:
             raise NotFoundError(resource="Profile", resource_id=username)
         return profile
 
+    def _cache_profile(self, profile: Profile, generation: int) -> CachedResponse:
+        cached = CachedResponse(
+            public_json(profile, ProfilePublic),
+            *resource_validators(profile.id, profile.updated_at),
+        )
+        profile_cache.set(("id", profile.id), cached, generation)
+        profile_cache.set(("username", profile.username), cached, generation)
+        return cached
+
+    async def get_profile_json_by_id(
+        self,
+        profile_id: int,
+        cache_checked: bool = False
+    ) -> CachedResponse:
+        """Profile dạng JSON (ProfilePublic) kèm ETag qua read-through cache
+
+        cache_checked=True: caller vừa tra cache và miss, không tra (và đếm miss) lại.
+        """
+        cached = None if cache_checked else profile_cache.get(("id", profile_id))
+        if cached is None:
+            prefer_primary_after_invalidation(self.session, profile_cache, ("id", profile_id))
+            generation = profile_cache.generation()
+            cached = self._cache_profile(await self.get_profile_by_id(profile_id), generation)
+        return cached
+
+    async def get_profile_json_by_username(
+        self,
+        username: str,
+        cache_checked: bool = False
+    ) -> CachedResponse:
+        """Profile dạng JSON (ProfilePublic) theo username kèm ETag qua read-through cache"""
+        cached = None if cache_checked else profile_cache.get(("username", username))
+        if cached is None:
+            prefer_primary_after_invalidation(self.session, profile_cache, ("username", username))
+            generation = profile_cache.generation()
+            cached = self._cache_profile(await self.get_profile_by_username(username), generation)
+        return cached
+
+    async def get_profile_validators_by_id(
+        self,
+        profile_id: int
+    ) -> Union[CachedResponse, Validators]:
+        """ETag/Last-Modified của profile: từ cache, nếu không có thì chỉ query updated_at"""
+        cached = profile_cache.get(("id", profile_id))
+        if cached is not None:
+            return cached
+
+        version = await self.repository.get_version(profile_id)
+        if not version:
+            raise NotFoundError(resource="Profile", resource_id=profile_id)
+        return resource_validators(*version)
+
+    async def get_profile_validators_by_username(
+        self,
+        username: str
+    ) -> Union[CachedResponse, Validators]:
+        """Như get_profile_validators_by_id nhưng theo username"""
+        cached = profile_cache.get(("username", username))
+        if cached is not None:
+            return cached
+
+        version = await self.repository.get_version_by_username(username)
+        if not version:
+            raise NotFoundError(resource="Profile", resource_id=username)
+        return resource_validators(*version)
+
+    async def get_profiles_page(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> CachedResponse:
+        """Trang danh sách mặc định (mới nhất trước) dạng JSON kèm ETag/X-Next-Cursor qua cache"""
+        generation = profile_list_cache.generation()
+        key = (generation, skip, limit, cursor)
+        cached = profile_list_cache.get(key)
+        if cached is None:
+            prefer_primary_after_invalidation(self.session, profile_list_cache)
+            profiles = await self.search_profiles(skip=skip, limit=limit, cursor=cursor)
+            cached = page_response(profiles, ProfilePublic, limit)
+            profile_list_cache.set(key, cached, generation)
+        return cached
+
     async def search_profiles(
         self,
         username_query: Optional[str] = None,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[Profile]:
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[Row]:
         """Tìm profiles với filter và phân trang"""
         if username_query:
+            if cursor:
+                raise APIValidationError(
+                    "Cursor chỉ dùng cho danh sách mặc định (không có username)"
+                )
             return await self.repository.search_by_username(
                 username_query=username_query,
                 skip=skip,
                 limit=limit
             )
         else:
-            return await self.repository.get_all(skip=skip, limit=limit)
+            after = decode_cursor(cursor) if cursor else None
+            return await self.repository.get_all(skip=skip, limit=limit, after=after)
+
+    async def export_profiles(self, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        """Stream toàn bộ profiles dạng NDJSON/CSV (cursor chỉ mở khi bắt đầu stream)"""
+        result = await self.repository.stream_all()
+        async for chunk in export_chunks(result, export_format):
+            yield chunk
+
+    async def count_profiles(self, exact: bool = False) -> TotalCount:
+        """Tổng số profiles: ước lượng khi bảng lớn, trừ khi exact=True"""
+        prefer_primary_after_invalidation(self.session, profile_list_cache)
+        return await resolve_count(
+            profile_count_cache,
+            (profile_list_cache.generation(), exact),
+            self.repository.count,
+            None if exact else self.repository.estimate_count,
+            size_key="profile_rows",
+        )
 
     async def update_profile(
         self,
@@ -137,17 +411,21 @@ class ProfileService:
         profile_data: ProfileUpdate
     ) -> Profile:
         """Cập nhật profile với validation"""
-        profile = await self.get_profile_by_id(profile_id)
-
         update_data = profile_data.model_dump(exclude_unset=True)
+        old_username = None
 
         # Validate username nếu được update
         if "username" in update_data:
             new_username = update_data["username"]
             self._validate_username(new_username)
 
+            # Username cũ để cập nhật autocomplete index
+            old_username = await self.repository.get_username(profile_id)
+            if old_username is None:
+                raise NotFoundError(resource="Profile", resource_id=profile_id)
+
             # Check username uniqueness (exclude current profile)
-            if await self.repository.username_exists(new_username, exclude_id=profile_id):
+            if not await self.is_username_available(new_username, exclude_id=profile_id):
                 raise ConflictError(
                     f"Username '{new_username}' đã được sử dụng"
                 )
@@ -162,13 +440,53 @@ class ProfileService:
             avatar_url = update_data["avatar_url"]
             self._validate_avatar_url(avatar_url)
 
-        # Apply updates
-        for field, value in update_data.items():
-            setattr(profile, field, value)
+        # Apply updates trong một câu UPDATE ... RETURNING
+        try:
+            profile = await self.repository.update(profile_id, update_data)
+        except IntegrityError:
+            # Fallback check trong case có race condition
+            raise ConflictError(
+                f"Username '{update_data.get('username')}' đã được sử dụng"
+            )
 
-        return await self.repository.update(profile)
+        if not profile:
+            raise NotFoundError(resource="Profile", resource_id=profile_id)
+
+        invalidate_on_commit(
+            self.session,
+            profile_cache,
+            ("id", profile_id),
+            ("username", profile.username),
+            ("username", old_username),
+        )
+        invalidate_on_commit(self.session, profile_list_cache)
+
+        if old_username is not None and old_username != profile.username:
+            add_username(profile.username)
+            after_commit(
+                self.session,
+                lambda: self._on_username_renamed(old_username, profile.username)
+            )
+        return profile
+
+    @staticmethod
+    def _on_username_renamed(old_username: str, new_username: str) -> None:
+        username_index.rename(old_username, new_username)
+        remove_username(old_username)
+
+    @staticmethod
+    def _on_username_removed(username: str) -> None:
+        username_index.remove(username)
+        remove_username(username)
 
     async def delete_profile(self, profile_id: int) -> None:
         """Xóa profile"""
-        profile = await self.get_profile_by_id(profile_id)
-        await self.repository.delete(profile)
+        username = await self.repository.delete(profile_id)
+        if username is None:
+            raise NotFoundError(resource="Profile", resource_id=profile_id)
+
+        invalidate_on_commit(
+            self.session, profile_cache, ("id", profile_id), ("username", username)
+        )
+        invalidate_on_commit(self.session, profile_list_cache)
+        after_commit(self.session, lambda: self._on_username_removed(username))
@@ -1,4 +1,6 @@
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import DateTime, Index
 from sqlmodel import Field, SQLModel
 from app.core.mixins import TimestampMixin
 
@@ -12,5 +14,26 @@ class TodoBase(SQLModel):
 
 class Todo(TodoBase, TimestampMixin, table=True):
     """Database model cho Todo"""
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC (có/không filter completed)
+        Index("ix_todo_created_at_id", "created_at", "id"),
+        Index("ix_todo_completed_created_at_id", "completed", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
+
+
+class TodoCounter(SQLModel, table=True):
+    """Bộ đếm total/completed của todos, chia thành nhiều shard (id = số shard)
+
+    Mỗi lần ghi cộng delta vào một shard ngẫu nhiên trong cùng transaction; giá
+    trị thật là tổng các shard. Reconcile định kỳ gộp về shard 0 và sửa drift do
+    ghi thẳng vào DB.
+    """
+    __tablename__ = "todo_counter"
+
+    id: int = Field(default=0, primary_key=True)
+    total: int = 0
+    completed: int = 0
+    reconciled_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
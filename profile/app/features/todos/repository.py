@@ -1,7 +1,23 @@
-from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Row, RowMapping, delete, func, insert, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlmodel import select
-from app.features.todos.model import Todo
+from app.core.config import settings
+from app.core.database import REPLICA
+from app.core.mixins import utcnow
+from app.core.pagination import estimate_row_count
+from app.features.todos.model import Todo, TodoCounter
+from app.features.todos.schemas import TodoPublic
+
+# Các cột do database tự sinh, không đưa vào INSERT
+_SERVER_GENERATED = {"id", "created_at", "updated_at"}
+
+# Cột theo thứ tự field của TodoPublic: trang danh sách chỉ đọc thành Row (tuple),
+# không tạo ORM instance và không qua identity map
+_PUBLIC_COLUMNS = tuple(Todo.__table__.c[name] for name in TodoPublic.model_fields)
 
 
 class TodoRepository:
@@ -9,40 +25,225 @@ class TodoRepository:
         self.session = session
 
     async def create(self, todo: Todo) -> Todo:
-        self.session.add(todo)
-        await self.session.commit()
-        await self.session.refresh(todo)
-        return todo
+        statement = (
+            insert(Todo)
+            .values(**todo.model_dump(exclude=_SERVER_GENERATED))
+            .returning(Todo)
+        )
+        result = await self.session.execute(statement)
+        return result.scalars().one()
+
+    async def create_many(self, values: List[Dict[str, Any]]) -> List[RowMapping]:
+        """Tạo nhiều todos bằng multi-row INSERT ... RETURNING, chia theo chunk
+
+        Dùng Core (không tạo ORM instance) để giảm overhead. Kết quả theo đúng thứ
+        tự input và mỗi chunk là một câu multi-row VALUES trên mọi dialect:
+        PostgreSQL dùng sort_by_parameter_order của SQLAlchemy; SQLite không có
+        sentinel (SQLAlchemy sẽ insert từng row) nên insert không kèm thứ tự rồi
+        sắp xếp lại theo id, vì SQLite cấp rowid tăng dần theo thứ tự VALUES trong
+        một câu lệnh và chỉ có một writer.
+        """
+        table = Todo.__table__
+        ordered = self.session.get_bind().dialect.name != "sqlite"
+        statement = insert(table).returning(*table.c, sort_by_parameter_order=ordered)
+        chunk_size = settings.bulk_insert_chunk_size
+
+        created: List[RowMapping] = []
+        for start in range(0, len(values), chunk_size):
+            result = await self.session.execute(statement, values[start:start + chunk_size])
+            rows = result.mappings().all()
+            created.extend(rows if ordered else sorted(rows, key=itemgetter("id")))
+        return created
 
     async def get_by_id(self, todo_id: int) -> Optional[Todo]:
-        result = await self.session.get(Todo, todo_id)
-        return result
+        statement = select(Todo).where(Todo.id == todo_id)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.scalars().first()
+
+    async def get_version(self, todo_id: int) -> Optional[Row]:
+        """(id, updated_at) của todo, dùng cho ETag mà không load cả row"""
+        statement = select(Todo.id, Todo.updated_at).where(Todo.id == todo_id)
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.first()
 
     async def get_all(
-        self, 
-        skip: int = 0, 
+        self,
+        skip: int = 0,
         limit: int = 100,
-        completed: Optional[bool] = None
-    ) -> List[Todo]:
-        statement = select(Todo)
-        
+        completed: Optional[bool] = None,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Row]:
+        """Lấy todos mới nhất trước; after=(created_at, id) để phân trang keyset
+
+        Chỉ đọc (Core projection): trả về Row gồm các cột của TodoPublic.
+        """
+        statement = select(*_PUBLIC_COLUMNS)
+
         if completed is not None:
             statement = statement.where(Todo.completed == completed)
-        
-        statement = statement.offset(skip).limit(limit).order_by(Todo.created_at.desc())
-        
+
+        if after is not None:
+            statement = statement.where(tuple_(Todo.created_at, Todo.id) < after)
+
+        statement = statement.offset(skip).limit(limit).order_by(
+            Todo.created_at.desc(), Todo.id.desc()
+        )
+
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return list(result.all())
+
+    async def count(self, **filters: Any) -> int:
+        """COUNT(*) chính xác theo filter (ids, completed, created_before)"""
+        statement = select(func.count()).select_from(Todo).where(*self._filter_clauses(**filters))
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        return result.scalar_one()
+
+    async def count_for_write(self, **filters: Any) -> int:
+        """Như count nhưng đọc từ primary, dùng trong transaction ghi"""
+        statement = select(func.count()).select_from(Todo).where(*self._filter_clauses(**filters))
+        result = await self.session.execute(statement)
+        return result.scalar_one()
+
+    async def aggregate_stats(self) -> Tuple[int, int]:
+        """(total, completed) của cả bảng trong một lần scan, đọc từ primary"""
+        statement = select(func.count(), func.count().filter(Todo.completed == True))  # noqa: E712
+        result = await self.session.execute(statement.select_from(Todo))
+        total, completed = result.one()
+        return total, completed
+
+    async def get_counter(self) -> Optional[Row]:
+        """(total, completed, reconciled_at) = tổng các shard, None nếu chưa có shard nào"""
+        statement = select(
+            func.sum(TodoCounter.total).label("total"),
+            func.sum(TodoCounter.completed).label("completed"),
+            func.max(TodoCounter.reconciled_at).label("reconciled_at"),
+            func.count().label("shards"),
+        )
+        result = await self.session.execute(statement, bind_arguments=REPLICA)
+        row = result.one()
+        return row if row.shards else None
+
+    async def add_to_counter(self, shard: int, total_delta: int, completed_delta: int) -> bool:
+        """Cộng delta vào một shard (row bị khóa tới hết transaction), False nếu chưa có shard"""
+        statement = (
+            update(TodoCounter)
+            .where(TodoCounter.id == shard)
+            .values(
+                total=TodoCounter.total + total_delta,
+                completed=TodoCounter.completed + completed_delta,
+            )
+        )
         result = await self.session.execute(statement)
-        return list(result.scalars().all())
+        return result.rowcount > 0
+
+    async def lock_counter(self) -> Optional[Tuple[int, int]]:
+        """Khóa mọi shard (PostgreSQL, theo thứ tự id) và trả về tổng (total, completed)"""
+        statement = (
+            select(TodoCounter.total, TodoCounter.completed)
+            .order_by(TodoCounter.id)
+            .with_for_update()
+        )
+        result = await self.session.execute(statement)
+        rows = result.all()
+        if not rows:
+            return None
+        return sum(row.total for row in rows), sum(row.completed for row in rows)
+
+    async def set_counter(self, total: int, completed: int, shards: int) -> None:
+        """Ghi đè bộ đếm: shard 0 giữ toàn bộ giá trị, shard 1..shards-1 về 0
 
-    async def update(self, todo: Todo) -> Todo:
-        from datetime import datetime, timezone
-        todo.updated_at = datetime.now(timezone.utc)
-        self.session.add(todo)
-        await self.session.commit()
-        await self.session.refresh(todo)
-        return todo
+        Shard ngoài khoảng (khi giảm số shard) bị xóa.
+        """
+        dialect_insert = (
+            postgresql.insert
+            if self.session.get_bind().dialect.name == "postgresql"
+            else sqlite.insert
+        )
+        statement = dialect_insert(TodoCounter).values(reconciled_at=utcnow())
+        statement = statement.on_conflict_do_update(
+            index_elements=[TodoCounter.id],
+            set_={
+                "total": statement.excluded.total,
+                "completed": statement.excluded.completed,
+                "reconciled_at": utcnow(),
+            },
+        )
+        values = [
+            {"id": shard, "total": 0, "completed": 0} for shard in range(shards)
+        ]
+        values[0].update(total=total, completed=completed)
+        await self.session.execute(statement, values)
+        await self.session.execute(delete(TodoCounter).where(TodoCounter.id >= shards))
 
-    async def delete(self, todo: Todo) -> None:
-        await self.session.delete(todo)
-        await self.session.commit()
+    async def estimate_count(self) -> Optional[int]:
+        """Số todo ước lượng từ thống kê của planner (chỉ PostgreSQL)"""
+        return await estimate_row_count(self.session, Todo.__tablename__)
 
+    async def stream_all(self, completed: Optional[bool] = None) -> AsyncResult:
+        """Mở server-side cursor trên todos (theo id) cho export, caller phải close result"""
+        statement = select(*Todo.__table__.c).where(*self._filter_clauses(completed=completed))
+        statement = statement.order_by(Todo.id).execution_options(
+            yield_per=settings.export_fetch_size
+        )
+        return await self.session.stream(statement, bind_arguments=REPLICA)
+
+    async def update(
+        self,
+        todo_id: int,
+        values: Dict[str, Any],
+        completed: Optional[bool] = None
+    ) -> Optional[Todo]:
+        """UPDATE ... RETURNING, trả về None nếu không có row nào bị ảnh hưởng
+
+        completed: chỉ cập nhật khi trạng thái completed hiện tại bằng giá trị này.
+        """
+        statement = (
+            update(Todo)
+            .where(Todo.id == todo_id, *self._filter_clauses(completed=completed))
+            .values(**values, updated_at=utcnow())
+            .returning(Todo)
+        )
+        result = await self.session.execute(statement)
+        return result.scalars().first()
+
+    def _filter_clauses(
+        self,
+        ids: Optional[List[int]] = None,
+        completed: Optional[bool] = None,
+        created_before: Optional[datetime] = None
+    ) -> list:
+        clauses = []
+        if ids is not None:
+            clauses.append(Todo.id.in_(ids))
+        if completed is not None:
+            clauses.append(Todo.completed == completed)
+        if created_before is not None:
+            clauses.append(Todo.created_at < created_before)
+        return clauses
+
+    async def update_where(self, values: Dict[str, Any], **filters: Any) -> int:
+        """UPDATE todo SET ... WHERE <filter> (một câu lệnh), trả về số row bị ảnh hưởng"""
+        statement = (
+            update(Todo)
+            .where(*self._filter_clauses(**filters))
+            .values(**values, updated_at=utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(statement)
+        return result.rowcount
+
+    async def delete_where(self, **filters: Any) -> int:
+        """DELETE FROM todo WHERE <filter> (một câu lệnh), trả về số row bị xóa"""
+        statement = (
+            delete(Todo)
+            .where(*self._filter_clauses(**filters))
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(statement)
+        return result.rowcount
+
+    async def delete(self, todo_id: int) -> Optional[Todo]:
+        """DELETE ... RETURNING, trả về todo đã xóa hoặc None nếu không tìm thấy"""
+        statement = delete(Todo).where(Todo.id == todo_id).returning(Todo)
+        result = await self.session.execute(statement)
+        return result.scalars().first()
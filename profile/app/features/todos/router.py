@@ -1,54 +1,170 @@
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.conditional import cached_response, conditional_get
 from app.core.database import get_session
-from app.features.todos.schemas import TodoCreate, TodoUpdate, TodoPublic
+from app.core.export import EXPORT_MEDIA_TYPES, ExportFormat, export_headers
+from app.core.pagination import TotalCount, set_total_count_headers
+from app.core.responses import public_response
+from app.features.todos.schemas import (
+    TodoCreate,
+    TodoUpdate,
+    TodoPublic,
+    TodoFilter,
+    TodoBulkUpdate,
+    TodoBulkResult,
+    TodoStatsPublic,
+)
 from app.features.todos.service import TodoService
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
 
-def get_todo_service(session: AsyncSession = Depends(get_session)) -> TodoService:
+def get_todo_service(
+    session: AsyncSession = Depends(get_session, scope="function"),
+) -> TodoService:
+    return TodoService(session)
+
+
+def get_todo_export_service(
+    session: AsyncSession = Depends(get_session, scope="request"),
+) -> TodoService:
+    """Session sống tới khi stream response kết thúc (không đóng ngay sau handler)"""
     return TodoService(session)
 
 
 @router.post("/", response_model=TodoPublic, status_code=201)
 async def create_todo(
     todo_data: TodoCreate,
+    response: Response,
     service: TodoService = Depends(get_todo_service)
 ):
     """Tạo một todo mới"""
-    return await service.create_todo(todo_data)
+    return public_response(
+        await service.create_todo(todo_data), TodoPublic, status_code=201, response=response
+    )
+
+
+@router.post("/bulk", response_model=List[TodoPublic], status_code=201)
+async def create_todos_bulk(
+    response: Response,
+    todos_data: List[TodoCreate] = Body(..., min_length=1, max_length=settings.bulk_max_items),
+    service: TodoService = Depends(get_todo_service)
+):
+    """Tạo nhiều todos trong một request (multi-row INSERT), trả về theo thứ tự input"""
+    return public_response(
+        await service.create_todos(todos_data), TodoPublic, status_code=201, response=response
+    )
+
+
+@router.patch("/bulk", response_model=TodoBulkResult)
+async def update_todos_bulk(
+    bulk_data: TodoBulkUpdate,
+    service: TodoService = Depends(get_todo_service)
+):
+    """Cập nhật mọi todo khớp filter bằng một câu UPDATE, trả về số row bị ảnh hưởng"""
+    affected = await service.bulk_update_todos(bulk_data.filter, bulk_data.values)
+    return TodoBulkResult(affected=affected)
+
+
+@router.delete("/bulk", response_model=TodoBulkResult)
+async def delete_todos_bulk(
+    ids: Optional[List[int]] = Query(None),
+    completed: Optional[bool] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    service: TodoService = Depends(get_todo_service)
+):
+    """Xóa mọi todo khớp filter bằng một câu DELETE, trả về số row bị xóa"""
+    todo_filter = TodoFilter(ids=ids, completed=completed, created_before=created_before)
+    affected = await service.bulk_delete_todos(todo_filter)
+    return TodoBulkResult(affected=affected)
 
 
 @router.get("/", response_model=List[TodoPublic])
 async def get_todos(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     completed: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None, description="Cursor từ header X-Next-Cursor (keyset pagination)"),
+    include_total: bool = Query(False, description="Trả về header X-Total-Count"),
+    exact: bool = Query(False, description="X-Total-Count chính xác (COUNT(*)) thay vì ước lượng"),
+    service: TodoService = Depends(get_todo_service)
+):
+    """Lấy danh sách todos với phân trang và filter
+
+    Trang kế tiếp: truyền lại giá trị header X-Next-Cursor vào `cursor`
+    (không bị chậm dần khi đi sâu như skip/limit).
+    ETag là hash của (id, updated_at) các phần tử; khớp If-None-Match thì trả 304.
+    Response được cache theo tham số query, mọi lần ghi todo làm mới cache.
+    """
+    page = await service.get_todos_page(
+        skip=skip, limit=limit, completed=completed, cursor=cursor
+    )
+    response = cached_response(request, page)
+    if include_total:
+        set_total_count_headers(response, await service.count_todos(completed, exact))
+    return response
+
+
+@router.get("/stats", response_model=TodoStatsPublic)
+async def get_todo_stats(service: TodoService = Depends(get_todo_service)):
+    """Thống kê total/completed/open (bộ đếm trong DB cập nhật cùng mỗi lần ghi, reconcile định kỳ)"""
+    return await service.get_stats()
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_todos(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    completed: Optional[bool] = Query(None),
+    service: TodoService = Depends(get_todo_export_service)
+):
+    """Export toàn bộ todos dạng NDJSON hoặc CSV, stream theo batch từ server-side cursor"""
+    return StreamingResponse(
+        service.export_todos(format, completed=completed),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers("todos", format),
+    )
+
+
+@router.get("/count", response_model=TotalCount)
+async def count_todos(
+    completed: Optional[bool] = Query(None),
+    exact: bool = Query(False, description="Luôn dùng COUNT(*) thay vì ước lượng cho bảng lớn"),
     service: TodoService = Depends(get_todo_service)
 ):
-    """Lấy danh sách todos với phân trang và filter"""
-    return await service.get_all_todos(skip=skip, limit=limit, completed=completed)
+    """Tổng số todos (ước lượng khi bảng lớn và không filter, exact=true để đếm chính xác)"""
+    return await service.count_todos(completed=completed, exact=exact)
 
 
 @router.get("/{todo_id}", response_model=TodoPublic)
 async def get_todo(
     todo_id: int,
+    request: Request,
     service: TodoService = Depends(get_todo_service)
 ):
-    """Lấy thông tin một todo theo ID"""
-    return await service.get_todo_by_id(todo_id)
+    """Lấy thông tin một todo theo ID (read-through cache, ETag/Last-Modified, 304)"""
+    return await conditional_get(
+        request,
+        lambda: service.get_todo_validators(todo_id),
+        lambda cache_checked: service.get_todo_json(todo_id, cache_checked),
+    )
 
 
 @router.patch("/{todo_id}", response_model=TodoPublic)
 async def update_todo(
     todo_id: int,
     todo_data: TodoUpdate,
+    response: Response,
     service: TodoService = Depends(get_todo_service)
 ):
     """Cập nhật thông tin một todo"""
-    return await service.update_todo(todo_id, todo_data)
+    return public_response(
+        await service.update_todo(todo_id, todo_data), TodoPublic, response=response
+    )
 
 
 @router.delete("/{todo_id}", status_code=204)
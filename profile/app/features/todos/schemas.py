@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from sqlmodel import Field, SQLModel
 from app.features.todos.model import TodoBase
 
@@ -22,3 +22,28 @@ class TodoPublic(TodoBase):
     created_at: datetime
     updated_at: datetime
 
+
+class TodoFilter(SQLModel):
+    """Điều kiện chọn todos cho bulk update/delete (kết hợp bằng AND)"""
+    ids: Optional[List[int]] = None
+    completed: Optional[bool] = None
+    created_before: Optional[datetime] = None
+
+
+class TodoBulkUpdate(SQLModel):
+    """Schema để cập nhật nhiều todos theo filter"""
+    filter: TodoFilter
+    values: TodoUpdate
+
+
+class TodoBulkResult(SQLModel):
+    """Kết quả bulk update/delete"""
+    affected: int
+
+
+class TodoStatsPublic(SQLModel):
+    """Schema thống kê todos (bộ đếm trong DB, reconcile định kỳ)"""
+    total: int
+    completed: int
+    open: int
+    reconciled_at: Optional[datetime] = None
@@ -1,18 +1,79 @@
-from typing import List, Optional
+import random
+from typing import AsyncIterator, List, Optional, Union
+from sqlalchemy import Row, RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.features.todos.model import Todo
-from app.features.todos.schemas import TodoCreate, TodoUpdate
+from app.features.todos.schemas import (
+    TodoCreate,
+    TodoUpdate,
+    TodoFilter,
+    TodoPublic,
+    TodoStatsPublic,
+)
 from app.features.todos.repository import TodoRepository
-from app.core.exceptions import NotFoundError
+from app.features.todos.stats import reconcile_todo_stats
+from app.core.cache import (
+    CachedResponse,
+    clear_on_commit,
+    create_cache,
+    create_ttl_cache,
+    invalidate_on_commit,
+    prefer_primary_after_invalidation,
+)
+from app.core.config import settings
+from app.core.conditional import Validators, page_response, resource_validators
+from app.core.export import ExportFormat, export_chunks
+from app.core.exceptions import NotFoundError, APIValidationError
+from app.core.pagination import TotalCount, decode_cursor, resolve_count
+from app.core.responses import public_json
+
+# Cache JSON của TodoPublic theo id
+todo_cache = create_cache("todos")
+
+# Cache các trang danh sách, key gắn generation: mọi lần ghi chỉ cần tăng generation
+todo_list_cache = create_cache("todo_lists")
+
+# Cache kết quả count ngắn hạn, key gắn generation của todo_list_cache
+todo_count_cache = create_ttl_cache(settings.count_cache_ttl_seconds)
 
 
 class TodoService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repository = TodoRepository(session)
 
     async def create_todo(self, todo_data: TodoCreate) -> Todo:
         todo = Todo(**todo_data.model_dump())
-        return await self.repository.create(todo)
+        created = await self.repository.create(todo)
+        self._invalidate()
+        await self._update_stats(1, int(created.completed))
+        return created
+
+    async def create_todos(self, todos_data: List[TodoCreate]) -> List[RowMapping]:
+        values = [todo_data.model_dump() for todo_data in todos_data]
+        created = await self.repository.create_many(values)
+        self._invalidate()
+        await self._update_stats(len(created), sum(1 for row in created if row["completed"]))
+        return created
+
+    async def _update_stats(self, total_delta: int, completed_delta: int) -> None:
+        """Cộng delta vào một shard ngẫu nhiên của bộ đếm, cùng transaction với lần ghi
+
+        Shard bị khóa tới khi commit nên gọi ở cuối mỗi thao tác ghi; các
+        transaction đồng thời thường rơi vào shard khác nhau nên không chờ nhau.
+        """
+        if not (total_delta or completed_delta):
+            return
+        shard = random.randrange(max(settings.todo_stats_shards, 1))
+        if not await self.repository.add_to_counter(shard, total_delta, completed_delta):
+            # Chưa có row: aggregate đã tính cả thay đổi của transaction này
+            await reconcile_todo_stats(self.session)
+
+    def _invalidate(self, *todo_ids: int) -> None:
+        """Invalidate cache các todo theo id và mọi trang danh sách"""
+        if todo_ids:
+            invalidate_on_commit(self.session, todo_cache, *todo_ids)
+        invalidate_on_commit(self.session, todo_list_cache)
 
     async def get_todo_by_id(self, todo_id: int) -> Todo:
         todo = await self.repository.get_by_id(todo_id)
@@ -20,24 +81,183 @@ class TodoService:
             raise NotFoundError(resource="Todo", resource_id=todo_id)
         return todo
 
+    async def get_todo_json(self, todo_id: int, cache_checked: bool = False) -> CachedResponse:
+        """Todo dạng JSON (TodoPublic) kèm ETag qua read-through cache
+
+        cache_checked=True: caller vừa tra cache và miss, không tra (và đếm miss) lại.
+        """
+        cached = None if cache_checked else todo_cache.get(todo_id)
+        if cached is None:
+            prefer_primary_after_invalidation(self.session, todo_cache, todo_id)
+            generation = todo_cache.generation()
+            todo = await self.get_todo_by_id(todo_id)
+            cached = CachedResponse(
+                public_json(todo, TodoPublic),
+                *resource_validators(todo.id, todo.updated_at),
+            )
+            todo_cache.set(todo_id, cached, generation)
+        return cached
+
+    async def get_todo_validators(self, todo_id: int) -> Union[CachedResponse, Validators]:
+        """ETag/Last-Modified của todo: từ cache, nếu không có thì chỉ query updated_at"""
+        cached = todo_cache.get(todo_id)
+        if cached is not None:
+            return cached
+
+        version = await self.repository.get_version(todo_id)
+        if not version:
+            raise NotFoundError(resource="Todo", resource_id=todo_id)
+        return resource_validators(*version)
+
+    async def get_todos_page(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        completed: Optional[bool] = None,
+        cursor: Optional[str] = None
+    ) -> CachedResponse:
+        """Trang danh sách todos dạng JSON kèm ETag/X-Next-Cursor qua cache"""
+        generation = todo_list_cache.generation()
+        key = (generation, skip, limit, completed, cursor)
+        cached = todo_list_cache.get(key)
+        if cached is None:
+            prefer_primary_after_invalidation(self.session, todo_list_cache)
+            todos = await self.get_all_todos(
+                skip=skip, limit=limit, completed=completed, cursor=cursor
+            )
+            cached = page_response(todos, TodoPublic, limit)
+            todo_list_cache.set(key, cached, generation)
+        return cached
+
     async def get_all_todos(
         self,
         skip: int = 0,
         limit: int = 100,
+        completed: Optional[bool] = None,
+        cursor: Optional[str] = None
+    ) -> List[Row]:
+        after = decode_cursor(cursor) if cursor else None
+        return await self.repository.get_all(
+            skip=skip, limit=limit, completed=completed, after=after
+        )
+
+    async def export_todos(
+        self,
+        export_format: ExportFormat,
         completed: Optional[bool] = None
-    ) -> List[Todo]:
-        return await self.repository.get_all(skip=skip, limit=limit, completed=completed)
+    ) -> AsyncIterator[bytes]:
+        """Stream toàn bộ todos dạng NDJSON/CSV (cursor chỉ mở khi bắt đầu stream)"""
+        result = await self.repository.stream_all(completed=completed)
+        async for chunk in export_chunks(result, export_format):
+            yield chunk
+
+    async def count_todos(
+        self,
+        completed: Optional[bool] = None,
+        exact: bool = False
+    ) -> TotalCount:
+        """Tổng số todos: ước lượng khi bảng lớn và không filter, trừ khi exact=True"""
+        prefer_primary_after_invalidation(self.session, todo_list_cache)
+        key = (todo_list_cache.generation(), completed, exact)
+        estimate = self.repository.estimate_count if completed is None and not exact else None
+        return await resolve_count(
+            todo_count_cache,
+            key,
+            lambda: self.repository.count(completed=completed),
+            estimate,
+            size_key="todo_rows" if completed is None else None,
+        )
+
+    async def get_stats(self) -> TodoStatsPublic:
+        """Thống kê total/completed/open từ bộ đếm todo_counter (O(1)), lần đầu thì aggregate"""
+        counter = await self.repository.get_counter()
+        if counter is None:
+            await reconcile_todo_stats(self.session)
+            counter = await self.repository.get_counter()
+        return TodoStatsPublic(
+            total=counter.total,
+            completed=counter.completed,
+            open=counter.total - counter.completed,
+            reconciled_at=counter.reconciled_at,
+        )
 
     async def update_todo(self, todo_id: int, todo_data: TodoUpdate) -> Todo:
-        todo = await self.get_todo_by_id(todo_id)
-        
         update_data = todo_data.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(todo, field, value)
-        
-        return await self.repository.update(todo)
+
+        # Đổi completed: UPDATE chỉ khớp khi trạng thái thực sự đổi, nên RETURNING
+        # cho biết delta của bộ đếm mà không cần đọc (và khóa) trạng thái cũ trước
+        completed = update_data.get("completed")
+        changed = None
+        if completed is not None:
+            changed = await self.repository.update(todo_id, update_data, completed=not completed)
+        todo = changed if changed is not None else await self.repository.update(
+            todo_id, update_data
+        )
+        if not todo:
+            raise NotFoundError(resource="Todo", resource_id=todo_id)
+        self._invalidate(todo_id)
+        if changed is not None:
+            await self._update_stats(0, 1 if completed else -1)
+        return todo
 
     async def delete_todo(self, todo_id: int) -> None:
-        todo = await self.get_todo_by_id(todo_id)
-        await self.repository.delete(todo)
+        deleted = await self.repository.delete(todo_id)
+        if not deleted:
+            raise NotFoundError(resource="Todo", resource_id=todo_id)
+        self._invalidate(todo_id)
+        await self._update_stats(-1, -int(deleted.completed))
+
+    def _invalidate_filtered(self, filters: dict) -> None:
+        if set(filters) == {"ids"}:
+            self._invalidate(*filters["ids"])
+        else:
+            # Không biết chính xác id nào bị ảnh hưởng
+            clear_on_commit(self.session, todo_cache)
+            invalidate_on_commit(self.session, todo_list_cache)
+
+    def _filter_args(self, todo_filter: TodoFilter) -> dict:
+        filters = todo_filter.model_dump(exclude_none=True)
+        # Không cho phép bulk update/delete toàn bộ bảng khi quên filter
+        if not filters:
+            raise APIValidationError(
+                "Cần ít nhất một điều kiện filter (ids, completed, created_before)"
+            )
+        return filters
+
+    async def bulk_update_todos(self, todo_filter: TodoFilter, todo_data: TodoUpdate) -> int:
+        filters = self._filter_args(todo_filter)
+        update_data = todo_data.model_dump(exclude_unset=True)
+        if not update_data:
+            raise APIValidationError("Không có field nào để cập nhật")
+
+        # Số row thực sự đổi trạng thái completed (đếm trước khi UPDATE)
+        completed = update_data.get("completed")
+        changed = 0
+        if completed is not None and "completed" not in filters:
+            changed = await self.repository.count_for_write(**filters, completed=not completed)
+
+        affected = await self.repository.update_where(update_data, **filters)
+        if affected:
+            self._invalidate_filtered(filters)
+            if completed is not None:
+                if "completed" in filters:
+                    # Filter đã cố định trạng thái cũ: đổi tất cả hoặc không row nào
+                    changed = affected if filters["completed"] != completed else 0
+                await self._update_stats(0, changed if completed else -changed)
+        return affected
+
+    async def bulk_delete_todos(self, todo_filter: TodoFilter) -> int:
+        filters = self._filter_args(todo_filter)
+
+        # Số todo completed trong tập bị xóa (đếm trước khi DELETE)
+        completed_deleted = 0
+        if "completed" not in filters:
+            completed_deleted = await self.repository.count_for_write(**filters, completed=True)
 
+        affected = await self.repository.delete_where(**filters)
+        if affected:
+            self._invalidate_filtered(filters)
+            if "completed" in filters:
+                completed_deleted = affected if filters["completed"] else 0
+            await self._update_stats(-affected, -completed_deleted)
+        return affected
@@ -0,0 +1,32 @@
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.features.todos.repository import TodoRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_todo_stats(session: AsyncSession) -> None:
+    """Đặt lại bộ đếm todo_counter theo aggregate thật trên bảng todo
+
+    Gộp toàn bộ giá trị về shard 0, các shard khác về 0. Khóa mọi shard trước
+    rồi mới aggregate (câu lệnh sau, snapshot mới): lần ghi nào đã cộng delta
+    thì đã commit và có trong aggregate, lần ghi chưa cộng delta sẽ chờ khóa và
+    cộng sau khi reconcile commit, nên không có delta nào bị tính hai lần hay bị mất. Chạy trong transaction của ``session``.
+    """
+    repository = TodoRepository(session)
+    current = await repository.lock_counter()
+    total, completed = await repository.aggregate_stats()
+    if current is not None and current != (total, completed):
+        logger.info(
+            "Todo stats drift corrected: total %s -> %s, completed %s -> %s",
+            current[0], total, current[1], completed,
+        )
+    await repository.set_counter(total, completed, max(settings.todo_stats_shards, 1))
+
+
+async def run_todo_stats_reconcile(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    """Reconcile với session riêng (chạy lúc startup và định kỳ trong nền)"""
+    async with session_maker() as session:
+        async with session.begin():
+            await reconcile_todo_stats(session)
@@ -1,16 +1,27 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.exceptions import RequestValidationError
 from app.core.config import settings
-from app.core.database import create_db_and_tables, close_db
-from app.core.logging import setup_logging
+from app.core.database import (
+    async_session_maker,
+    create_db_and_tables,
+    close_db,
+    schedule_periodic,
+    start_db_maintenance,
+)
+from app.core.logging import flush_log_summaries, setup_logging, shutdown_logging
+from app.core.metrics import flush_metrics
 from app.core.exceptions import (
     http_exception_handler,
     validation_exception_handler,
     general_exception_handler,
 )
 from app.core.health import router as health_router
+from app.core.responses import FastJSONResponse
 from app.features.todos import router as todos_router
 from app.features.profiles import router as profiles_router
+from app.features.profiles.autocomplete import build_username_indexes
+from app.features.todos.stats import run_todo_stats_reconcile
+from app.middleware.metrics import MetricsMiddleware
 from app.middleware.request_id import RequestIDMiddleware
 from app.middleware.cors import setup_cors
 from contextlib import asynccontextmanager
@@ -30,12 +41,35 @@ async def lifespan(app: FastAPI) -> Generator[None, None, None]:
     setup_logging()
     logger.info("Starting up application...")
     await create_db_and_tables()
+    await build_username_indexes(async_session_maker)
+    await run_todo_stats_reconcile(async_session_maker)
+    start_db_maintenance()
+    if settings.todo_stats_reconcile_seconds > 0:
+        schedule_periodic(
+            settings.todo_stats_reconcile_seconds,
+            lambda: run_todo_stats_reconcile(async_session_maker),
+            "Todo stats reconcile",
+        )
+    if settings.username_filter_rebuild_seconds > 0:
+        schedule_periodic(
+            settings.username_filter_rebuild_seconds,
+            lambda: build_username_indexes(async_session_maker),
+            "Username index rebuild",
+        )
+    if settings.log_dedup_window_seconds > 0:
+        schedule_periodic(
+            settings.log_dedup_window_seconds, flush_log_summaries, "Log summaries"
+        )
+    if settings.metrics_multiproc_dir and settings.metrics_flush_seconds > 0:
+        schedule_periodic(settings.metrics_flush_seconds, flush_metrics, "Metrics flush")
     logger.info("Application started successfully")
     yield
     # Shutdown: Đóng database connections
     logger.info("Shutting down application...")
     await close_db()
+    await flush_metrics()
     logger.info("Application shut down successfully")
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -44,10 +78,12 @@ app = FastAPI(
     version="0.1.0",
     debug=settings.debug,
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Setup middleware
 app.add_middleware(RequestIDMiddleware)
+app.add_middleware(MetricsMiddleware)
 setup_cors(app)
 
 # Register exception handlers (thứ tự quan trọng - specific trước generic)
@@ -1,4 +1,5 @@
+from app.middleware.metrics import MetricsMiddleware
 from app.middleware.request_id import RequestIDMiddleware
 
-__all__ = ["RequestIDMiddleware"]
+__all__ = ["MetricsMiddleware", "RequestIDMiddleware"]
 
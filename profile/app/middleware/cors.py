@@ -1,4 +1,44 @@
+from typing import Sequence
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_ORIGIN = b"origin"
+_TIMING_ALLOW_ORIGIN = b"timing-allow-origin"
+
+
+class TimingAllowOriginMiddleware:
+    """Pure ASGI middleware thêm Timing-Allow-Origin cho các origin được phép
+
+    Thiếu header này, trình duyệt ở origin khác không cho JavaScript đọc
+    Server-Timing (và chi tiết Resource Timing) của response.
+    """
+
+    def __init__(self, app: ASGIApp, allow_origins: Sequence[str]) -> None:
+        self.app = app
+        self.allow_origins = {origin.encode("latin-1") for origin in allow_origins}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        for name, value in scope["headers"]:
+            if name == _ORIGIN:
+                origin = value
+                break
+        if origin not in self.allow_origins:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_timing_allow_origin(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", ()), (_TIMING_ALLOW_ORIGIN, origin)
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing_allow_origin)
 
 
 def setup_cors(app) -> None:
@@ -15,12 +55,20 @@ def setup_cors(app) -> None:
     # Trong production, nên lấy từ environment variables
     # allowed_origins = settings.cors_origins.split(",") if hasattr(settings, "cors_origins") else []
     
+    app.add_middleware(TimingAllowOriginMiddleware, allow_origins=allowed_origins)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=allowed_origins,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["X-Request-ID"],
+        expose_headers=[
+            "X-Request-ID",
+            "X-Next-Cursor",
+            "ETag",
+            "Last-Modified",
+            "X-Total-Count",
+            "X-Total-Count-Estimated",
+            "Server-Timing",
+        ],
     )
-
@@ -0,0 +1,46 @@
+import time
+from typing import Dict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+
+# Request không khớp route nào gom chung một label (tránh cardinality theo path)
+UNMATCHED_ROUTE = "<unmatched>"
+
+_status_labels: Dict[int, str] = {}
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware đo latency theo method/route template/status và số request đang xử lý"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Exception thoát khỏi app: ServerErrorMiddleware trả về 500
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # FastAPI gắn route đã khớp vào scope trong lúc routing
+            route = scope.get("route")
+            status = _status_labels.get(status_code)
+            if status is None:
+                status = _status_labels[status_code] = str(status_code)
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status
+            ).observe(duration)
@@ -1,40 +1,127 @@
-import uuid
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
 import logging
+import random
+import time
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.context import (
+    RequestTimings,
+    new_request_id,
+    request_id_var,
+    request_timings_var,
+    valid_request_id,
+)
 
 logger = logging.getLogger(__name__)
 
+_HEADER = b"x-request-id"
+_SERVER_TIMING = b"server-timing"
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Middleware để thêm Request ID vào mỗi request"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Tạo hoặc lấy request ID từ header
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        
-        # Thêm request ID vào request state
-        request.state.request_id = request_id
-        
-        # Log request
-        logger.info(
-            f"Request started: {request.method} {request.url.path}",
-            extra={"request_id": request_id},
-        )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Thêm request ID vào response header
-        response.headers["X-Request-ID"] = request_id
-        
-        # Log response
-        logger.info(
-            f"Request completed: {request.method} {request.url.path} - "
-            f"Status: {response.status_code}",
-            extra={"request_id": request_id},
-        )
-        
-        return response
 
+class RequestIDMiddleware:
+    """Pure ASGI middleware thêm Request ID vào mỗi request
+
+    Lấy X-Request-ID từ client (nếu hợp lệ) hoặc tạo mới, lưu vào
+    ``request.state.request_id`` và context var ``request_id_var``, rồi thêm
+    header vào response bằng cách bọc ``send`` (không bọc lại body nên
+    streaming response không bị ảnh hưởng).
+
+    Số query và thời gian DB/serialize của request được cộng vào
+    ``request_timings_var`` và trả về trong header Server-Timing (tính tới lúc
+    gửi header; query chạy trong lúc stream body không có trong header).
+
+    Mỗi request log một dòng khi kết thúc: request thành công được lấy mẫu theo
+    ``log_request_sample_rate``, request chậm (WARNING) hoặc lỗi 5xx (ERROR) luôn
+    được log.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == _HEADER:
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not valid_request_id(request_id):
+            request_id = new_request_id()
+
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (_HEADER, request_id.encode("latin-1"))
+        timings = RequestTimings()
+        server_timing = settings.server_timing_enabled
+        status_code = None
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [*message.get("headers", ()), header]
+                if server_timing:
+                    headers.append(
+                        (_SERVER_TIMING, _server_timing(timings, time.perf_counter() - start))
+                    )
+                message["headers"] = headers
+            await send(message)
+
+        start = time.perf_counter()
+        token = request_id_var.set(request_id)
+        timings_token = request_timings_var.set(timings)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_timings_var.reset(timings_token)
+            request_id_var.reset(token)
+            _log_request(scope, request_id, status_code, time.perf_counter() - start, timings)
+
+
+def _server_timing(timings: RequestTimings, elapsed: float) -> bytes:
+    """db (kèm số query), serialize và phần còn lại (app), đơn vị ms"""
+    db_ms = timings.db_time * 1000
+    serialize_ms = timings.serialize_time * 1000
+    app_ms = max(elapsed * 1000 - db_ms - serialize_ms, 0.0)
+    return (
+        f'db;dur={db_ms:.1f};desc="{timings.queries} queries", '
+        f"serialize;dur={serialize_ms:.1f}, app;dur={app_ms:.1f}"
+    ).encode("latin-1")
+
+
+def _log_request(
+    scope: Scope,
+    request_id: str,
+    status_code: Optional[int],
+    duration: float,
+    timings: RequestTimings,
+) -> None:
+    duration_ms = duration * 1000
+    if status_code is None or status_code >= 500:
+        # status None: exception thoát khỏi app (ServerErrorMiddleware trả 500)
+        level = logging.ERROR
+    elif duration_ms >= settings.log_slow_request_ms:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+        rate = settings.log_request_sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+    if logger.isEnabledFor(level):
+        db_time_ms = timings.db_time * 1000
+        logger.log(
+            level,
+            "Request completed: %s %s - Status: %s - %.1fms (%d queries, %.1fms db)",
+            scope["method"], scope["path"], status_code or 500, duration_ms,
+            timings.queries, db_time_ms,
+            extra={
+                "request_id": request_id,
+                "status_code": status_code,
+                "duration_ms": duration_ms,
+                "db_queries": timings.queries,
+                "db_time_ms": db_time_ms,
+            },
+        )
@@ -0,0 +1,126 @@
+"""So sánh CPU và bộ nhớ cho một trang 100 todos: ORM + response_model và Core projection
+
+Mỗi vòng mở session mới (như một request), đọc trang từ SQLite in-memory (fetch)
+rồi serialize body kèm ETag (render). Chạy từ thư mục gốc project:
+
+    python -m benchmarks.list_read [--items 100] [--rounds 500]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, List, Sequence, Tuple
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, select
+from app.core.conditional import page_etag, page_response
+from app.features.todos.model import Todo
+from app.features.todos.repository import TodoRepository
+from app.features.todos.schemas import TodoPublic
+
+_adapter = TypeAdapter(List[TodoPublic])
+
+Fetch = Callable[[AsyncSession, int], Awaitable[Sequence[Any]]]
+Render = Callable[[Sequence[Any], int], Tuple[bytes, str]]
+
+
+async def _orm_fetch(session: AsyncSession, limit: int) -> Sequence[Any]:
+    # Trước: ORM instance (identity map)
+    statement = select(Todo).order_by(Todo.created_at.desc(), Todo.id.desc()).limit(limit)
+    return list((await session.execute(statement)).scalars().all())
+
+
+def _orm_render(todos: Sequence[Any], limit: int) -> Tuple[bytes, str]:
+    # Trước: validate (from_attributes) rồi dump theo response_model
+    body = _adapter.dump_json(_adapter.validate_python(todos, from_attributes=True))
+    return body, page_etag((todo.id, todo.updated_at) for todo in todos)
+
+
+async def _projection_fetch(session: AsyncSession, limit: int) -> Sequence[Any]:
+    # Sau: Row của các cột public
+    return await TodoRepository(session).get_all(limit=limit)
+
+
+def _projection_render(rows: Sequence[Any], limit: int) -> Tuple[bytes, str]:
+    page = page_response(rows, TodoPublic, limit)
+    return page.body, page.etag
+
+
+async def _measure(
+    session_maker: async_sessionmaker[AsyncSession],
+    fetch: Fetch,
+    render: Render,
+    limit: int,
+    rounds: int,
+) -> Tuple[float, float, float]:
+    """(CPU µs fetch, CPU µs render, KiB cấp phát tối đa) trung bình mỗi trang"""
+    fetch_cpu = render_cpu = 0.0
+    for _ in range(rounds):
+        start = time.process_time()
+        async with session_maker() as session:
+            items = await fetch(session, limit)
+        middle = time.process_time()
+        render(items, limit)
+        fetch_cpu += middle - start
+        render_cpu += time.process_time() - middle
+
+    # Đo riêng vì tracemalloc làm chậm đáng kể
+    sample = max(rounds // 10, 1)
+    peak = 0
+    tracemalloc.start()
+    for _ in range(sample):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        async with session_maker() as session:
+            render(await fetch(session, limit), limit)
+        peak += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return fetch_cpu / rounds * 1e6, render_cpu / rounds * 1e6, peak / sample / 1024
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[Todo.__table__])
+        await conn.execute(Todo.__table__.insert(), [
+            {"title": f"Todo {i}", "description": "Lorem ipsum " * 5, "completed": i % 3 == 0}
+            for i in range(args.items)
+        ])
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    variants = (
+        ("ORM + response_model", _orm_fetch, _orm_render),
+        ("Core projection", _projection_fetch, _projection_render),
+    )
+    outputs = []
+    for _, fetch, render in variants:
+        async with session_maker() as session:
+            body, etag = render(await fetch(session, args.items), args.items)
+        outputs.append((json.loads(body), etag))
+    assert outputs[0] == outputs[1]
+
+    print(f"Trang {args.items} todos, {args.rounds} rounds (trung bình mỗi trang)")
+    print(f"  {'':<22} {'fetch µs':>9} {'render µs':>10} {'tổng µs':>9} {'peak KiB':>9}")
+    results = [
+        await _measure(session_maker, fetch, render, args.items, args.rounds)
+        for _, fetch, render in variants
+    ]
+    for (name, _, _), (fetch_cpu, render_cpu, peak) in zip(variants, results):
+        print(f"  {name:<22} {fetch_cpu:9.1f} {render_cpu:10.1f} {fetch_cpu + render_cpu:9.1f} {peak:9.1f}")
+
+    (orm_fetch, orm_render, orm_peak), (fetch_cpu, render_cpu, peak) = results
+    print(
+        f"  Tỉ lệ: fetch x{orm_fetch / fetch_cpu:.2f}, render x{orm_render / render_cpu:.2f}, "
+        f"tổng x{(orm_fetch + orm_render) / (fetch_cpu + render_cpu):.2f}, peak x{orm_peak / peak:.2f}"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
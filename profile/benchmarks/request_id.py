@@ -0,0 +1,99 @@
+"""Overhead mỗi request của RequestIDMiddleware: BaseHTTPMiddleware cũ và pure ASGI
+
+Gọi app ASGI trực tiếp (không qua HTTP) với endpoint trả response rỗng, log
+INFO bị lọc như production với level WARNING. Chạy từ thư mục gốc project:
+
+    python -m benchmarks.request_id [--rounds 20000]
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from typing import List
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message
+from app.middleware.request_id import RequestIDMiddleware
+
+logger = logging.getLogger("benchmarks.request_id")
+
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """Bản cũ (BaseHTTPMiddleware + uuid4 + f-string log) để so sánh"""
+
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        request.state.request_id = request_id
+        logger.info(
+            f"Request started: {request.method} {request.url.path}",
+            extra={"request_id": request_id},
+        )
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        logger.info(
+            f"Request completed: {request.method} {request.url.path} - "
+            f"Status: {response.status_code}",
+            extra={"request_id": request_id},
+        )
+        return response
+
+
+async def _endpoint(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _scope() -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/todos/1",
+        "raw_path": b"/todos/1",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"test"), (b"accept", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+
+
+async def _measure(app: ASGIApp, rounds: int) -> float:
+    messages: List[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    for _ in range(100):
+        await app(_scope(), receive, send)
+    start = time.process_time()
+    for _ in range(rounds):
+        await app(_scope(), receive, send)
+        messages.clear()
+    return (time.process_time() - start) / rounds * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    bare = await _measure(_endpoint, args.rounds)
+    legacy = await _measure(LegacyRequestIDMiddleware(_endpoint), args.rounds)
+    current = await _measure(RequestIDMiddleware(_endpoint), args.rounds)
+
+    print(f"{args.rounds} requests (CPU µs/request, overhead = trừ đi app không middleware)")
+    print(f"  {'không middleware':<22} {bare:8.1f}")
+    print(f"  {'BaseHTTPMiddleware':<22} {legacy:8.1f}  overhead {legacy - bare:7.1f}")
+    print(f"  {'pure ASGI':<22} {current:8.1f}  overhead {current - bare:7.1f}")
+    print(f"  Overhead giảm x{(legacy - bare) / max(current - bare, 1e-3):.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""So sánh CPU serialize một trang 100 todos: pipeline mặc định của FastAPI và public_json
+
+Chạy từ thư mục gốc project:
+
+    python -m benchmarks.serialization [--items 100] [--rounds 2000]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+from pydantic import TypeAdapter
+from app.core.responses import FastJSONResponse, public_json
+from app.features.todos.model import Todo
+from app.features.todos.schemas import TodoPublic
+
+
+def _todos(count: int) -> List[Todo]:
+    now = datetime.now(timezone.utc)
+    return [
+        Todo(
+            id=i,
+            title=f"Todo {i}",
+            description="Lorem ipsum dolor sit amet " * 3,
+            completed=i % 3 == 0,
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def _fastapi_default(todos: List[Todo]) -> bytes:
+    # Như FastAPI với response_model: validate (from_attributes), dump mode="json", json.dumps
+    adapter = _adapter
+    value = adapter.validate_python(todos, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def _fast_response(todos: List[Todo]) -> bytes:
+    # response_model validate/dump nhưng encode bằng FastJSONResponse
+    value = _adapter.validate_python(todos, from_attributes=True)
+    return FastJSONResponse(_adapter.dump_python(value, mode="json")).body
+
+
+def _public_json(todos: List[Todo]) -> bytes:
+    return public_json(todos, TodoPublic)
+
+
+_adapter = TypeAdapter(List[TodoPublic])
+
+
+def _measure(func: Callable[[List[Todo]], bytes], todos: List[Todo], rounds: int) -> float:
+    func(todos)
+    start = time.process_time()
+    for _ in range(rounds):
+        func(todos)
+    return (time.process_time() - start) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2_000)
+    args = parser.parse_args()
+
+    todos = _todos(args.items)
+    assert json.loads(_fastapi_default(todos)) == json.loads(_public_json(todos))
+
+    baseline = _measure(_fastapi_default, todos, args.rounds)
+    print(f"{args.items} todos, {args.rounds} rounds (CPU µs/request)")
+    for name, func in (
+        ("validate + json.dumps (trước)", _fastapi_default),
+        ("validate + FastJSONResponse", _fast_response),
+        ("public_json (sau)", _public_json),
+    ):
+        cpu = baseline if func is _fastapi_default else _measure(func, todos, args.rounds)
+        print(f"  {name:<32} {cpu:9.1f}  x{baseline / cpu:.2f}")
+
+
+if __name__ == "__main__":
+    main()
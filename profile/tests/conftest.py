@@ -3,9 +3,13 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from sqlmodel import SQLModel
 from httpx import AsyncClient, ASGITransport
 from app.main import app
-from app.core.database import get_session
+from app.core.cache import clear_caches
+from fastapi import Response
+from app.core.database import RoutingSession, get_batch_session, get_session
 from app.features.todos.model import Todo  # noqa: F401
 from app.features.profiles.model import Profile  # noqa: F401
+from app.features.profiles.autocomplete import username_index
+from app.features.profiles.availability import username_filter
 
 
 # Tạo test database engine (in-memory)
@@ -40,20 +44,63 @@ async def test_session(test_engine):
         yield session
 
 
-# Override get_session dependency
+# Override get_session dependency (commit/rollback mỗi request giống get_session)
 @pytest.fixture(scope="function")
 async def override_get_session(test_session):
     async def _get_session():
-        yield test_session
+        try:
+            yield test_session
+        except Exception:
+            await test_session.rollback()
+            raise
+        else:
+            await test_session.commit()
     
     app.dependency_overrides[get_session] = _get_session
+    app.dependency_overrides[get_batch_session] = _get_session
     yield
     app.dependency_overrides.clear()
 
 
+# Reset username index/filter và cache (state trong bộ nhớ dùng chung giữa các test)
+@pytest.fixture(autouse=True)
+def reset_username_index():
+    username_index.load([])
+    username_filter.load([])
+    clear_caches()
+    yield
+    username_index.load([])
+    username_filter.load([])
+    clear_caches()
+
+
 # Test client
 @pytest.fixture(scope="function")
 async def client(override_get_session):
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
+
+# Client với RoutingSession có replica (dùng chung database): lần ghi set cookie read-your-writes
+@pytest.fixture(scope="function")
+async def routing_client(test_engine):
+    session_maker = async_sessionmaker(
+        test_engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        replicas=[test_engine.sync_engine],
+        expire_on_commit=False,
+    )
+
+    async def _get_session(response: Response):
+        async with session_maker() as session:
+            session.info["response"] = response
+            async with session.begin():
+                yield session
+
+    app.dependency_overrides[get_session] = _get_session
+    app.dependency_overrides[get_batch_session] = _get_session
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+
@@ -0,0 +1,34 @@
+from app.core.bloom import CountingBloomFilter
+
+
+def test_bloom_filter_membership():
+    """Test add/remove và không có false negative"""
+    bloom = CountingBloomFilter(capacity=1_000, error_rate=0.01)
+    names = [f"user{i}" for i in range(1_000)]
+    for name in names:
+        bloom.add(name)
+
+    assert all(name in bloom for name in names)
+    assert len(bloom) == 1_000
+
+    # Tỉ lệ false positive xấp xỉ error_rate
+    false_positives = sum(f"other{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+
+    for name in names[:500]:
+        bloom.remove(name)
+    assert all(name in bloom for name in names[500:])
+    assert sum(name in bloom for name in names[:500]) < 50
+
+
+def test_bloom_filter_load_resizes():
+    """Test load build lại filter với capacity mới"""
+    bloom = CountingBloomFilter(capacity=10)
+    bloom.add("stale")
+
+    bloom.load(["alice", "bob"], capacity=100)
+
+    assert bloom.capacity == 100
+    assert len(bloom) == 2
+    assert "alice" in bloom
+    assert "stale" not in bloom
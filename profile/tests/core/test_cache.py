@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+import pytest
+from httpx import AsyncClient
+from app.core.cache import (
+    CachedResponse,
+    ResponseCache,
+    TTLCache,
+    prefer_primary_after_invalidation,
+)
+from app.core.config import settings
+from app.core.pagination import TotalCount, resolve_count
+
+
+def _cached(body: bytes) -> CachedResponse:
+    return CachedResponse(body, '"etag"')
+
+
+def test_cache_lru_eviction():
+    """Test LRU evict theo số entry và số byte"""
+    cache = ResponseCache("test", max_entries=2, max_bytes=10, ttl=60)
+    cache.set("a", _cached(b"1"))
+    cache.set("b", _cached(b"2"))
+    assert cache.get("a").body == b"1"  # "a" thành most recently used
+
+    cache.set("c", _cached(b"3"))
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"1"
+
+    cache.set("d", _cached(b"123456789"))
+    assert cache.get("c") is None
+    assert cache.get("a").body == b"1"
+    assert cache.status()["bytes"] == 10
+    assert cache.stats.evictions == 2
+
+
+def test_cache_ttl_and_generation(monkeypatch):
+    """Test entry hết hạn và set bị bỏ qua nếu có invalidation trong lúc load"""
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache("test", max_entries=10, max_bytes=1000, ttl=5)
+
+    cache.set("a", _cached(b"1"))
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+    generation = cache.generation()
+    cache.invalidate("b")
+    cache.set("b", _cached(b"stale"), generation)
+    assert cache.get("b") is None
+
+    status = cache.status()
+    assert status["hits"] == 0
+    assert status["misses"] == 2
+
+
+def test_prefer_primary_after_invalidation(monkeypatch):
+    """Test cache miss ngay sau invalidation đọc từ primary khi có replica"""
+    cache = ResponseCache("test", max_entries=10, max_bytes=100, ttl=60)
+    monkeypatch.setattr(settings, "database_replica_urls", ["postgresql+asyncpg://replica/db"])
+    monkeypatch.setattr(settings, "replica_read_your_writes_seconds", 5.0)
+
+    session = SimpleNamespace(info={})
+    prefer_primary_after_invalidation(session, cache, "a")
+    assert "pin_primary" not in session.info
+
+    cache.invalidate("a")
+    prefer_primary_after_invalidation(session, cache, "b")
+    assert "pin_primary" not in session.info
+    prefer_primary_after_invalidation(session, cache, "a")
+    assert session.info["pin_primary"] is True
+
+    monkeypatch.setattr(settings, "replica_read_your_writes_seconds", 0.0)
+    assert not cache.recently_invalidated("a", 0.0)
+    cache.clear()
+    assert cache.recently_invalidated(None, 5.0)
+
+
+@pytest.mark.asyncio
+async def test_cache_health_endpoint(client: AsyncClient):
+    """Test endpoint expose metrics của cache"""
+    created = (await client.post("/todos/", json={"title": "Cached"})).json()
+    before = (await client.get("/health/cache")).json()["caches"]["todos"]
+    await client.get(f"/todos/{created['id']}")
+    await client.get(f"/todos/{created['id']}")
+
+    response = await client.get("/health/cache")
+
+    assert response.status_code == 200
+    todos = response.json()["caches"]["todos"]
+    assert todos["hits"] - before["hits"] == 1
+    assert todos["misses"] - before["misses"] == 1
+    assert todos["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_count_estimate(monkeypatch):
+    """Test dùng ước lượng khi vượt ngưỡng, COUNT(*) khi nhỏ hơn và cache kết quả"""
+    monkeypatch.setattr(settings, "count_estimate_threshold", 1_000)
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def count():
+        calls.append("count")
+        return 10
+
+    async def estimate_large():
+        return 5_000
+
+    async def estimate_small():
+        return 10
+
+    assert await resolve_count(cache, "large", count, estimate_large) == TotalCount(
+        count=5_000, exact=False
+    )
+    assert await resolve_count(cache, "small", count, estimate_small) == TotalCount(
+        count=10, exact=True
+    )
+    assert await resolve_count(cache, "small", count, estimate_small) == TotalCount(
+        count=10, exact=True
+    )
+    assert calls == ["count"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_count_skips_estimate_for_small_table(monkeypatch):
+    """Test bảng nhỏ đã biết (COUNT chính xác dưới ngưỡng) chỉ chạy COUNT(*), không ước lượng"""
+    monkeypatch.setattr(settings, "count_estimate_threshold", 1_000)
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def count():
+        calls.append("count")
+        return 10
+
+    async def estimate():
+        calls.append("estimate")
+        return 10
+
+    # Generation khác nhau (sau invalidation) nhưng cùng size_key
+    for generation in range(3):
+        total = await resolve_count(cache, (generation,), count, estimate, size_key="rows")
+        assert total == TotalCount(count=10, exact=True)
+    assert calls == ["estimate", "count", "count", "count"]
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+from app.core.conditional import not_modified, page_etag, resource_validators
+from app.core.mixins import utcnow
+
+
+def _request(**headers: str) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_resource_validators_naive_utc():
+    """Test datetime naive (SQLite) được coi là UTC"""
+    naive = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    aware = naive.replace(tzinfo=timezone.utc)
+
+    assert resource_validators(1, naive) == resource_validators(1, aware)
+    assert resource_validators(1, naive).etag != resource_validators(2, naive).etag
+
+
+def test_not_modified_headers():
+    """Test If-None-Match ưu tiên hơn If-Modified-Since"""
+    validators = resource_validators(1, datetime(2024, 1, 1, 12, 0, 0, 500000))
+
+    assert not_modified(_request(if_none_match=f'"other", {validators.etag}'), validators)
+    assert not_modified(_request(if_none_match="*"), validators)
+    assert not_modified(_request(if_modified_since="Mon, 01 Jan 2024 12:00:00 GMT"), validators)
+    assert not not_modified(_request(if_modified_since="Mon, 01 Jan 2024 11:59:59 GMT"), validators)
+    assert not not_modified(_request(if_modified_since="not a date"), validators)
+    assert not not_modified(
+        _request(if_none_match='"other"', if_modified_since="Mon, 01 Jan 2024 12:00:00 GMT"),
+        validators,
+    )
+
+
+def test_page_etag_depends_on_order():
+    """Test ETag trang danh sách phụ thuộc cả thứ tự phần tử"""
+    updated_at = datetime(2024, 1, 1)
+    first = page_etag([(1, updated_at), (2, updated_at)])
+    assert first != page_etag([(2, updated_at), (1, updated_at)])
+    assert page_etag([]) == page_etag([])
+
+
+def test_utcnow_postgresql_clock_timestamp():
+    """Test updated_at trên PostgreSQL dùng clock_timestamp() (không phải now() của transaction)"""
+    assert str(utcnow().compile(dialect=postgresql.dialect())) == "clock_timestamp()"
@@ -0,0 +1,145 @@
+import pytest
+from fastapi import Response
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, select
+from app.core.database import (
+    READ_YOUR_WRITES_COOKIE,
+    REPLICA,
+    RoutingSession,
+    after_commit,
+    install_sqlite_pragmas,
+)
+from app.features.todos.model import Todo
+from app.features.todos.repository import TodoRepository
+
+
+@pytest.fixture
+async def routing_session_maker(tmp_path):
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    # Replica có dữ liệu riêng để phân biệt query chạy ở đâu
+    async with replica.begin() as conn:
+        await conn.execute(Todo.__table__.insert().values(title="from replica", completed=False))
+
+    yield async_sessionmaker(
+        primary,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        replicas=[replica.sync_engine],
+        expire_on_commit=False,
+    )
+
+    await primary.dispose()
+    await replica.dispose()
+
+
+async def _titles(session: AsyncSession, **kwargs):
+    result = await session.execute(select(Todo.title), **kwargs)
+    return list(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_and_primary_writes(routing_session_maker):
+    """Test query đánh dấu REPLICA chạy trên replica, còn lại chạy trên primary"""
+    async with routing_session_maker() as session:
+        assert await _titles(session, bind_arguments=REPLICA) == ["from replica"]
+        assert await _titles(session) == []
+
+
+@pytest.mark.asyncio
+async def test_sqlite_reader_serves_plain_selects(routing_session_maker):
+    """Test read_any_select: SELECT thường chạy trên reader, FOR UPDATE và sau lần ghi thì không"""
+    async with routing_session_maker(read_any_select=True) as session:
+        assert await _titles(session) == ["from replica"]
+        locked = await session.execute(select(Todo.title).with_for_update())
+        assert locked.scalars().all() == []
+
+        session.add(Todo(title="from primary"))
+        await session.flush()
+        assert await _titles(session) == ["from primary"]
+
+
+@pytest.mark.asyncio
+async def test_write_pins_session_to_primary(routing_session_maker):
+    """Test sau khi ghi, các lần đọc tiếp theo đều đi vào primary"""
+    response = Response()
+    async with routing_session_maker() as session:
+        session.info["response"] = response
+        session.add(Todo(title="from primary"))
+        await session.flush()
+
+        assert await _titles(session, bind_arguments=REPLICA) == ["from primary"]
+        assert session.info["pin_primary"] is True
+
+    assert READ_YOUR_WRITES_COOKIE in response.headers["set-cookie"]
+
+
+@pytest.mark.asyncio
+async def test_pinned_session_skips_replica(routing_session_maker):
+    """Test client trong cửa sổ read-your-writes không đọc từ replica"""
+    async with routing_session_maker() as session:
+        session.info["pin_primary"] = True
+        assert await _titles(session, bind_arguments=REPLICA) == []
+
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas(tmp_path):
+    """Test pragma WAL/synchronous được áp dụng, reader chỉ được đọc"""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pragmas.db'}"
+    writer = create_async_engine(url)
+    reader = create_async_engine(url)
+    install_sqlite_pragmas(writer)
+    install_sqlite_pragmas(reader, read_only=True)
+
+    async with writer.begin() as conn:
+        assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL = 1
+        assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with reader.connect() as conn:
+        assert (await conn.exec_driver_sql("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            await conn.execute(Todo.__table__.insert().values(title="x", completed=False))
+
+    await writer.dispose()
+    await reader.dispose()
+
+
+@pytest.mark.asyncio
+async def test_after_commit_callbacks(test_session: AsyncSession):
+    """Test callback after_commit chỉ chạy khi commit, bị bỏ khi rollback"""
+    calls = []
+
+    test_session.add(Todo(title="rolled back"))
+    after_commit(test_session, lambda: calls.append("rollback"))
+    await test_session.rollback()
+
+    test_session.add(Todo(title="committed"))
+    after_commit(test_session, lambda: calls.append("commit"))
+    await test_session.commit()
+
+    assert calls == ["commit"]
+
+
+@pytest.mark.asyncio
+async def test_timestamps_on_table_without_server_default():
+    """Test bảng tạo trước khi có server default (cột NOT NULL không default) vẫn insert được"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            "CREATE TABLE todo (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, "
+            "description VARCHAR, completed BOOLEAN NOT NULL, "
+            "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+        )
+    try:
+        async with AsyncSession(engine) as session:
+            created = await TodoRepository(session).create(Todo(title="Legacy"))
+            assert created.created_at is not None and created.updated_at is not None
+    finally:
+        await engine.dispose()
@@ -0,0 +1,42 @@
+import pytest
+from app.core.imports import ImportReport, iter_ndjson_lines
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _lines(*chunks: bytes, max_line_bytes: int = 16):
+    return [item async for item in iter_ndjson_lines(_chunks(*chunks), max_line_bytes)]
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines_split_across_chunks():
+    """Test dòng bị cắt giữa các chunk, dòng trống và dòng cuối không có newline"""
+    assert await _lines(b'{"a":', b' 1}\n\n  \n{"b": 2}\r\n', b'{"c": 3}') == [
+        (1, b'{"a": 1}'),
+        (4, b'{"b": 2}'),
+        (5, b'{"c": 3}'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines_too_long():
+    """Test dòng quá dài được trả về None và không giữ trong bộ nhớ"""
+    assert await _lines(b"x" * 20 + b"\nok\n") == [(1, None), (2, b"ok")]
+    assert await _lines(b"x" * 10, b"x" * 10, b"x" * 10, b"\nok") == [(1, None), (2, b"ok")]
+    assert await _lines(b"ok\n", b"x" * 20) == [(1, b"ok"), (2, None)]
+
+
+def test_import_report_issues_capped(monkeypatch):
+    """Test report chỉ giữ tối đa import_max_report_issues lỗi nhưng vẫn đếm đủ"""
+    monkeypatch.setattr("app.core.imports.settings.import_max_report_issues", 2)
+    report = ImportReport()
+    for line in range(1, 4):
+        report.fail(line, "invalid")
+    report.skip(4, "duplicate")
+
+    assert (report.failed, report.skipped) == (3, 1)
+    assert [issue.line for issue in report.issues] == [1, 2]
+    assert report.issues_truncated
@@ -0,0 +1,154 @@
+import json
+import logging
+import queue
+import sys
+from app.core.config import settings
+from app.core.context import request_id_var
+from app.core.exceptions import _client_error_log
+from app.core.logging import (
+    DroppingQueueHandler,
+    JSONFormatter,
+    RateLimitedLog,
+    RequestIDFilter,
+    _setup_json_logging,
+    shutdown_logging,
+)
+
+
+def _record(msg: str = "hello %s", *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args or ("world",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    """Test mỗi record thành một dòng JSON kèm request_id và extra"""
+    record = _record(path="/todos", method="GET")
+    RequestIDFilter().filter(record)
+    line = JSONFormatter().format(record)
+
+    assert "\n" not in line
+    data = json.loads(line)
+    assert data["message"] == "hello world"
+    assert data["level"] == "INFO"
+    assert data["logger"] == "app.test"
+    assert data["request_id"] is None
+    assert (data["path"], data["method"]) == ("/todos", "GET")
+
+
+def test_json_formatter_exception():
+    """Test exc_info được format thành traceback trong JSON"""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "failed", (), True)
+        record.exc_info = sys.exc_info()
+    data = json.loads(JSONFormatter().format(record))
+    assert "ValueError: boom" in data["exc_info"]
+
+
+def test_request_id_filter_uses_context():
+    """Test request_id lấy từ context var, không ghi đè giá trị truyền qua extra"""
+    token = request_id_var.set("req-1")
+    try:
+        record = _record()
+        RequestIDFilter().filter(record)
+        assert record.request_id == "req-1"
+
+        explicit = _record(request_id="req-2")
+        RequestIDFilter().filter(explicit)
+        assert explicit.request_id == "req-2"
+    finally:
+        request_id_var.reset(token)
+
+
+def test_dropping_queue_handler():
+    """Test queue đầy thì bỏ record và đếm, không chặn caller"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_record())
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    # Record không bị format trước khi vào queue
+    assert handler.queue.get_nowait().args == ("world",)
+
+
+def test_dropping_queue_handler_resolves_mutable_state():
+    """Test args có thể thay đổi và exc_info được resolve trước khi vào queue"""
+    handler = DroppingQueueHandler(queue.Queue())
+    items = [1]
+    record = _record("items=%s", items)
+    handler.handle(record)
+    items.append(2)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        error = _record()
+        error.exc_info = sys.exc_info()
+    handler.handle(error)
+
+    queued = handler.queue.get_nowait()
+    assert (queued.msg, queued.args) == ("items=[1]", None)
+    assert record.args == (items,)  # record gốc không bị đổi
+
+    queued = handler.queue.get_nowait()
+    assert queued.exc_info is None and "ValueError: boom" in queued.exc_text
+    assert error.exc_info is not None
+
+
+def test_shutdown_logging_falls_back_to_direct_writes(monkeypatch):
+    """Test sau shutdown_logging root logger ghi trực tiếp thay vì vào queue đã dừng"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    monkeypatch.setattr(settings, "log_format", "json")
+    for name in ("_srcfile", "logProcesses", "logThreads"):
+        monkeypatch.setattr(logging, name, getattr(logging, name))
+    try:
+        _setup_json_logging(logging.INFO)
+        shutdown_logging()
+        assert not any(isinstance(handler, DroppingQueueHandler) for handler in root.handlers)
+        writers = [handler for handler in root.handlers if isinstance(handler, logging.StreamHandler)]
+        assert any(isinstance(handler.formatter, JSONFormatter) for handler in writers)
+    finally:
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+
+
+def test_rate_limited_log(monkeypatch, caplog):
+    """Test chỉ log burst lần mỗi cửa sổ, phần bị chặn được tóm tắt khi flush"""
+    now = [100.0]
+    monkeypatch.setattr("app.core.logging.time.monotonic", lambda: now[0])
+    rate_limited = RateLimitedLog(logging.getLogger("app.test"), window=60, burst=2)
+
+    assert [rate_limited.allow("404 /profiles/{id}") for _ in range(5)] == [True, True, False, False, False]
+    assert rate_limited.allow("other")
+
+    with caplog.at_level(logging.WARNING, logger="app.test"):
+        rate_limited.flush()
+    assert [record.getMessage() for record in caplog.records] == [
+        "3 similar messages suppressed in the last 0s: 404 /profiles/{id}"
+    ]
+    assert not rate_limited.allow("404 /profiles/{id}")
+
+    # Cửa sổ mới: được log lại từ đầu
+    now[0] += 61
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.test"):
+        assert rate_limited.allow("404 /profiles/{id}")
+    assert "1 similar messages suppressed" in caplog.records[0].getMessage()
+
+
+async def test_client_errors_rate_limited(client, caplog):
+    """Test 404 lặp lại trên cùng route chỉ được log log_dedup_burst lần"""
+    _client_error_log.clear()
+    with caplog.at_level(logging.WARNING, logger="app.core.exceptions"):
+        for profile_id in range(1_000_000, 1_000_020):
+            assert (await client.get(f"/profiles/{profile_id}")).status_code == 404
+
+    logged = [record for record in caplog.records if record.name == "app.core.exceptions"]
+    assert len(logged) == settings.log_dedup_burst
@@ -0,0 +1,94 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from httpx import AsyncClient
+from app.core.metrics import (
+    _HistogramChild,
+    instrument_engine,
+    merge_snapshots,
+    merge_with_workers,
+    render,
+    write_snapshot,
+)
+
+
+def _histogram_snapshot(counts, total):
+    return {
+        "request_seconds": {
+            "kind": "histogram",
+            "help": "Latency",
+            "labelnames": ["route"],
+            "buckets": [0.1, 1.0],
+            "samples": [[["/todos"], [*counts, total]]],
+        }
+    }
+
+
+def test_histogram_render():
+    """Test bucket cộng dồn, +Inf, _sum và _count theo Prometheus text format"""
+    child = _HistogramChild((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = render(_histogram_snapshot(child.counts, child.sum))
+
+    assert "# TYPE request_seconds histogram" in text
+    assert 'request_seconds_bucket{route="/todos",le="0.1"} 2' in text
+    assert 'request_seconds_bucket{route="/todos",le="1"} 3' in text
+    assert 'request_seconds_bucket{route="/todos",le="+Inf"} 4' in text
+    assert 'request_seconds_sum{route="/todos"} 3.65' in text
+    assert 'request_seconds_count{route="/todos"} 4' in text
+
+
+def test_merge_snapshots_across_workers():
+    """Test cộng histogram của mọi worker, gauge của worker đã chết bị bỏ qua"""
+    def gauge(value):
+        return {"in_flight": {"kind": "gauge", "help": "", "labelnames": [], "samples": [[[], value]]}}
+
+    live = {**_histogram_snapshot([1, 0, 0], 0.05), **gauge(2)}
+    dead = {**_histogram_snapshot([0, 1, 1], 2.5), **gauge(7)}
+
+    merged = merge_snapshots([(live, True), (dead, False)])
+
+    assert merged["request_seconds"]["samples"] == [[["/todos"], [1, 1, 1, 2.55]]]
+    assert merged["in_flight"]["samples"] == [[[], 2]]
+
+
+def test_merge_with_workers(tmp_path):
+    """Test snapshot của worker hiện tại được ghi ra file và gộp với worker khác"""
+    other = tmp_path / "metrics_999999999.json"
+    other.write_text('{"request_seconds": {"kind": "histogram", "help": "", "labelnames": ["route"], '
+                     '"buckets": [0.1, 1.0], "samples": [[["/todos"], [0, 0, 1, 5.0]]]}}')
+
+    merged = merge_with_workers(_histogram_snapshot([1, 0, 0], 0.05), str(tmp_path))
+
+    assert (tmp_path / f"metrics_{os.getpid()}.json").exists()
+    assert merged["request_seconds"]["samples"] == [[["/todos"], [1, 0, 1, 5.05]]]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient, test_engine):
+    """Test /metrics có latency theo route template, query DB và cache hit ratio"""
+    instrument_engine(test_engine, "primary")
+    created = await client.post("/todos/", json={"title": "Metrics"})
+    await client.get(f"/todos/{created.json()['id']}")
+    await client.get(f"/todos/{created.json()['id']}")
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/todos/{todo_id}",status="200"}' in text
+    assert 'db_query_duration_seconds_count{role="primary",operation="insert"}' in text
+    assert "http_requests_in_flight 1" in text
+    assert 'cache_hit_ratio{cache="todos"}' in text
+
+
+def test_write_snapshot_concurrent(tmp_path):
+    """Test nhiều thread ghi snapshot cùng lúc không lỗi và không để lại file tạm"""
+    snapshot = _histogram_snapshot([1, 0, 0], 0.05)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: write_snapshot(snapshot, str(tmp_path)), range(200)))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"metrics_{os.getpid()}.json"]
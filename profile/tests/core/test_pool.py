@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from httpx import AsyncClient
+from app.core.pool import InstrumentedQueuePool, pool_status
+
+
+@pytest.mark.asyncio
+async def test_pool_status_counts_checkouts(tmp_path):
+    """Test pool status đếm checkout và connection đang dùng"""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=2,
+        max_overflow=1,
+    )
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        status = pool_status(engine)
+        assert status["checked_out"] == 1
+        assert status["size"] == 2
+        assert status["max_overflow"] == 1
+
+    status = pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["idle"] == 1
+    assert status["checkouts"] == 1
+    assert status["wait_time_max_ms"] >= 0
+
+    await engine.dispose()
+    # Bộ đếm được giữ lại sau khi dispose
+    assert pool_status(engine)["checkouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_health_pool_endpoint(client: AsyncClient):
+    """Test endpoint /health/pool"""
+    response = await client.get("/health/pool")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert "class" in data["pool"]
@@ -0,0 +1,62 @@
+import logging
+import pytest
+from httpx import AsyncClient
+from app.core.config import settings
+from app.core.context import RequestTimings, request_timings_var
+from app.core.metrics import instrument_engine
+from app.core.querylog import _slow_query_log, normalize_sql, record_query
+
+
+def test_normalize_sql():
+    """Test literal/placeholder thành ?, danh sách IN và nhiều row VALUES được gộp"""
+    assert normalize_sql(
+        "SELECT todo.id FROM todo\n WHERE todo.id IN (?, ?, ?) AND title = 'it''s' LIMIT 10"
+    ) == "SELECT todo.id FROM todo WHERE todo.id IN (?, ...) AND title = ? LIMIT ?"
+    assert normalize_sql(
+        "INSERT INTO todo (title, completed) VALUES ($1, $2), ($3, $4) RETURNING todo.id"
+    ) == "INSERT INTO todo (title, completed) VALUES (?, ...), ... RETURNING todo.id"
+    assert normalize_sql("SELECT * FROM t1 WHERE a = %(a_1)s AND b::text = :b") == (
+        "SELECT * FROM t1 WHERE a = ? AND b::text = ?"
+    )
+
+
+def test_record_query(monkeypatch, caplog):
+    """Test query được cộng vào request hiện tại, query chậm được log (có giới hạn lặp lại)"""
+    _slow_query_log.clear()
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 100.0)
+    timings = RequestTimings()
+    token = request_timings_var.set(timings)
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.core.querylog"):
+            record_query("primary", "SELECT 1", 0.01)
+            assert caplog.records == []
+
+            for _ in range(settings.log_dedup_burst + 3):
+                record_query("replica", "SELECT * FROM todo WHERE id = 5", 0.2)
+    finally:
+        request_timings_var.reset(token)
+        _slow_query_log.clear()
+
+    assert timings.queries == settings.log_dedup_burst + 4
+    assert timings.db_time == pytest.approx(0.01 + 0.2 * (settings.log_dedup_burst + 3))
+    assert len(caplog.records) == settings.log_dedup_burst
+    assert caplog.records[0].sql == "SELECT * FROM todo WHERE id = ?"
+    assert caplog.records[0].db_role == "replica"
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(client: AsyncClient, test_engine):
+    """Test Server-Timing có số query và thời gian db/serialize/app của request"""
+    instrument_engine(test_engine, "primary")
+    created = await client.post("/todos/", json={"title": "Timing"})
+    todo_id = created.json()["id"]
+
+    response = await client.get(f"/todos/{todo_id}")
+    timing = response.headers["server-timing"]
+    assert timing.startswith('db;dur=')
+    assert 'desc="1 queries"' in timing
+    assert "serialize;dur=" in timing and "app;dur=" in timing
+
+    # Lần sau đọc từ cache: không có query nào
+    response = await client.get(f"/todos/{todo_id}")
+    assert 'desc="0 queries"' in response.headers["server-timing"]
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from sqlalchemy import select
+from app.core.responses import FastJSONResponse, public_json
+from app.features.todos.model import Todo
+from app.features.todos.schemas import TodoPublic
+
+
+def _todo(todo_id: int) -> Todo:
+    now = datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    return Todo(id=todo_id, title=f"Todo ✓ {todo_id}", description=None, completed=True,
+                created_at=now, updated_at=now)
+
+
+def test_public_json_matches_model_dump():
+    """Test public_json cho ra đúng JSON như validate rồi dump qua schema public"""
+    todo = _todo(1)
+    expected = TodoPublic.model_validate(todo).model_dump_json().encode()
+
+    assert public_json(todo, TodoPublic) == expected
+    assert public_json([todo, _todo(2)], TodoPublic) == b"[" + expected + b"," + (
+        TodoPublic.model_validate(_todo(2)).model_dump_json().encode()
+    ) + b"]"
+    assert public_json([], TodoPublic) == b"[]"
+
+
+async def test_public_json_row_mapping(test_session):
+    """Test public_json nhận RowMapping (kết quả Core INSERT/SELECT)"""
+    test_session.add(_todo(1))
+    await test_session.flush()
+    result = await test_session.execute(select(*Todo.__table__.c))
+    row = result.mappings().one()
+
+    assert public_json(row, TodoPublic) == public_json(await test_session.get(Todo, 1), TodoPublic)
+
+
+def test_fast_json_response_render():
+    """Test FastJSONResponse: compact, UTF-8 và NaN thành null"""
+    response = FastJSONResponse({"a": float("nan"), "b": "é", "c": [1, 2]})
+    assert response.body == '{"a":null,"b":"é","c":[1,2]}'.encode()
+    assert response.headers["content-type"] == "application/json"
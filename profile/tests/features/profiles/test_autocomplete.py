@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.features.profiles.autocomplete import UsernameIndex, build_username_indexes, username_index
+from app.features.profiles.model import Profile
+
+
+def test_username_index_add_remove():
+    """Test thêm/xóa/đổi tên trong index giữ đúng thứ tự"""
+    index = UsernameIndex()
+    index.load(["bob", "Alice", "alex"])
+
+    assert index.suggest("a") == ["alex", "Alice"]
+
+    index.add("alan")
+    index.add("alan")  # trùng thì bỏ qua
+    assert index.suggest("AL") == ["alan", "alex", "Alice"]
+    assert len(index) == 4
+
+    index.rename("bob", "alfred")
+    index.remove("missing")
+    assert index.suggest("al", limit=3) == ["alan", "alex", "alfred"]
+    assert index.suggest("b") == []
+    assert index.suggest("z") == []
+
+
+def test_username_index_add_many():
+    """Test add_many merge username mới vào đúng vị trí, bỏ qua username đã có"""
+    index = UsernameIndex()
+    index.load(["bob", "Dave"])
+
+    index.add_many(["carol", "bob", "Alice", "carol", "erin", "aaron"])
+
+    assert index.suggest("") == ["aaron", "Alice", "bob", "carol", "Dave", "erin"]
+    assert len(index) == 6
+
+
+@pytest.mark.asyncio
+async def test_build_username_indexes(test_engine, test_session: AsyncSession):
+    """Test build index từ bảng Profile"""
+    test_session.add_all([Profile(username="zoe"), Profile(username="Zack")])
+    await test_session.commit()
+
+    await build_username_indexes(async_sessionmaker(test_engine, class_=AsyncSession))
+
+    assert username_index.suggest("z") == ["Zack", "zoe"]
@@ -173,8 +173,7 @@ async def test_update_profile(test_session: AsyncSession):
     created = await repository.create(profile)
 
     # Cập nhật
-    created.bio = "Updated bio"
-    result = await repository.update(created)
+    result = await repository.update(created.id, {"bio": "Updated bio"})
 
     assert result.bio == "Updated bio"
     assert result.updated_at >= created.updated_at
@@ -190,8 +189,65 @@ async def test_delete_profile(test_session: AsyncSession):
     created = await repository.create(profile)
 
     # Xóa
-    await repository.delete(created)
+    assert await repository.delete(created.id) == "testuser"
 
     # Verify đã xóa
     result = await repository.get_by_id(created.id)
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_update_delete_not_found(test_session: AsyncSession):
+    """Test update/delete profile không tồn tại"""
+    repository = ProfileRepository(test_session)
+
+    assert await repository.update(999, {"bio": "Updated bio"}) is None
+    assert await repository.delete(999) is None
+
+
+@pytest.mark.asyncio
+async def test_search_by_username_ranking(test_session: AsyncSession):
+    """Test xếp hạng kết quả tìm kiếm: exact > prefix > substring"""
+    from app.features.profiles import search
+    repository = ProfileRepository(test_session)
+
+    # Test database có bảng FTS5 trigram (tạo bởi create_all)
+    assert search.has_fts(str(test_session.get_bind().url))
+
+    await repository.create(Profile(username="the_doe"))
+    await repository.create(Profile(username="doe_john"))
+    await repository.create(Profile(username="Doe"))
+    await repository.create(Profile(username="smith"))
+
+    results = await repository.search_by_username("doe")
+
+    assert [p.username for p in results] == ["Doe", "doe_john", "the_doe"]
+
+
+@pytest.mark.asyncio
+async def test_search_by_username_index_in_sync(test_session: AsyncSession):
+    """Test index tìm kiếm được cập nhật khi đổi username và xóa profile"""
+    repository = ProfileRepository(test_session)
+
+    created = await repository.create(Profile(username="old_name"))
+    other = await repository.create(Profile(username="other_name"))
+
+    await repository.update(created.id, {"username": "brand_new"})
+    await repository.delete(other.id)
+
+    assert await repository.search_by_username("old") == []
+    assert await repository.search_by_username("other") == []
+    assert [p.username for p in await repository.search_by_username("new")] == ["brand_new"]
+
+
+@pytest.mark.asyncio
+async def test_search_by_username_short_and_wildcards(test_session: AsyncSession):
+    """Test query ngắn (không dùng trigram) và ký tự wildcard được escape"""
+    repository = ProfileRepository(test_session)
+
+    await repository.create(Profile(username="ab_cd"))
+    await repository.create(Profile(username="abxcd"))
+
+    assert [p.username for p in await repository.search_by_username("b_")] == ["ab_cd"]
+    assert [p.username for p in await repository.search_by_username("b_c")] == ["ab_cd"]
+    assert len(await repository.search_by_username("ab")) == 2
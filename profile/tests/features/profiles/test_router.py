@@ -1,5 +1,9 @@
+import csv
+import io
+import json
 import pytest
 from httpx import AsyncClient
+from app.core.database import READ_YOUR_WRITES_COOKIE
 from app.features.profiles.schemas import ProfileCreate, ProfileUpdate
 
 
@@ -116,6 +120,30 @@ async def test_get_profiles_pagination(client: AsyncClient):
     assert len(data) == 2
 
 
+@pytest.mark.asyncio
+async def test_get_profiles_cursor(client: AsyncClient):
+    """Test phân trang profiles bằng cursor"""
+    for i in range(3):
+        await client.post("/profiles/", json={"username": f"user{i}"})
+
+    response = await client.get("/profiles/?limit=2")
+    assert response.status_code == 200
+    first_page = [p["username"] for p in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(f"/profiles/?limit=2&cursor={cursor}")
+    assert response.status_code == 200
+    second_page = [p["username"] for p in response.json()]
+
+    assert first_page == ["user2", "user1"]
+    assert second_page == ["user0"]
+    assert "X-Next-Cursor" not in response.headers
+
+    # Cursor không dùng chung với tìm kiếm username
+    response = await client.get(f"/profiles/?username=user&cursor={cursor}")
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def test_get_profile_by_id_success(client: AsyncClient):
     """Test lấy profile theo ID thành công"""
@@ -252,3 +280,218 @@ async def test_delete_profile_not_found(client: AsyncClient):
     response = await client.delete("/profiles/999")
 
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_suggest_usernames(client: AsyncClient):
+    """Test autocomplete username theo prefix, cập nhật theo create/update/delete"""
+    for username in ["alice", "Alex", "albert", "bob"]:
+        await client.post("/profiles/", json={"username": username})
+
+    response = await client.get("/profiles/suggest", params={"prefix": "AL"})
+    assert response.status_code == 200
+    assert response.json() == ["albert", "Alex", "alice"]
+
+    response = await client.get("/profiles/suggest", params={"prefix": "al", "limit": 1})
+    assert response.json() == ["albert"]
+
+    # Rename và delete được phản ánh vào index
+    profiles = (await client.get("/profiles/", params={"username": "alice"})).json()
+    await client.patch(f"/profiles/{profiles[0]['id']}", json={"username": "carol"})
+    bob = (await client.get("/profiles/by-username/bob")).json()
+    await client.delete(f"/profiles/{bob['id']}")
+
+    assert (await client.get("/profiles/suggest", params={"prefix": "al"})).json() == [
+        "albert", "Alex"
+    ]
+    assert (await client.get("/profiles/suggest", params={"prefix": "c"})).json() == ["carol"]
+    assert (await client.get("/profiles/suggest", params={"prefix": "b"})).json() == []
+
+
+@pytest.mark.asyncio
+async def test_username_available(client: AsyncClient):
+    """Test endpoint kiểm tra username còn trống"""
+    await client.post("/profiles/", json={"username": "taken"})
+
+    response = await client.get("/profiles/username-available", params={"username": "taken"})
+    assert response.status_code == 200
+    assert response.json() == {"username": "taken", "available": False}
+
+    response = await client.get("/profiles/username-available", params={"username": "fresh"})
+    assert response.json()["available"] is True
+
+    response = await client.get("/profiles/username-available", params={"username": "a b"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_profile_cache_invalidated_on_rename(client: AsyncClient):
+    """Test cache theo id/username được invalidate khi đổi username và khi xóa"""
+    created = (await client.post("/profiles/", json={"username": "before"})).json()
+
+    # Đưa vào cache
+    assert (await client.get(f"/profiles/{created['id']}")).json()["username"] == "before"
+    assert (await client.get("/profiles/by-username/before")).status_code == 200
+
+    await client.patch(f"/profiles/{created['id']}", json={"username": "after"})
+
+    assert (await client.get(f"/profiles/{created['id']}")).json()["username"] == "after"
+    assert (await client.get("/profiles/by-username/before")).status_code == 404
+    assert (await client.get("/profiles/by-username/after")).status_code == 200
+
+    await client.delete(f"/profiles/{created['id']}")
+
+    assert (await client.get(f"/profiles/{created['id']}")).status_code == 404
+    assert (await client.get("/profiles/by-username/after")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_profile_by_username_conditional(client: AsyncClient):
+    """Test 304 cho GET /profiles/by-username/{username} và 404 khi không tồn tại"""
+    await client.post("/profiles/", json={"username": "etaguser"})
+
+    etag = (await client.get("/profiles/by-username/etaguser")).headers["etag"]
+    response = await client.get(
+        "/profiles/by-username/etaguser", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    response = await client.get("/profiles/by-username/missing", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_profiles_list_cache(client: AsyncClient):
+    """Test cache danh sách profiles được làm mới khi update"""
+    created = (await client.post("/profiles/", json={"username": "listed"})).json()
+
+    response = await client.get("/profiles/", params={"limit": 1})
+    assert response.json()[0]["bio"] is None
+    assert "x-next-cursor" in response.headers
+
+    await client.patch(f"/profiles/{created['id']}", json={"bio": "Changed"})
+
+    response = await client.get("/profiles/", params={"limit": 1})
+    assert response.json()[0]["bio"] == "Changed"
+    assert "x-next-cursor" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_profiles_total_count(client: AsyncClient):
+    """Test count profiles và include_total chỉ cho danh sách mặc định"""
+    await client.post("/profiles/", json={"username": "counted"})
+
+    assert (await client.get("/profiles/count")).json() == {"count": 1, "exact": True}
+
+    response = await client.get("/profiles/", params={"include_total": True})
+    assert response.headers["x-total-count"] == "1"
+
+    response = await client.get("/profiles/", params={"username": "count", "include_total": True})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_profiles(client: AsyncClient):
+    """Test export profiles dạng NDJSON và CSV theo thứ tự id"""
+    for username in ("alice", "bob", "carol"):
+        await client.post("/profiles/", json={"username": username})
+
+    response = await client.get("/profiles/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["username"] for row in rows] == ["alice", "bob", "carol"]
+
+    response = await client.get("/profiles/export", params={"format": "csv"})
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert "username" in rows[0]
+    assert len(rows) == 4
+
+    response = await client.get("/profiles/export", params={"format": "xml"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_import_profiles(client: AsyncClient):
+    """Test import NDJSON: insert, báo lỗi validation và bỏ qua username trùng"""
+    await client.post("/profiles/", json={"username": "existing", "bio": "old"})
+    body = "\n".join([
+        json.dumps({"username": "alice", "birthdate": "1990-01-01"}),
+        json.dumps({"username": "a"}),
+        "not json",
+        json.dumps({"username": "existing", "bio": "new"}),
+        json.dumps({"username": "bob", "avatar_url": "ftp://x"}),
+        json.dumps({"username": "alice"}),
+        json.dumps({"username": "carol"}),
+    ])
+
+    response = await client.post("/profiles/import", content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["inserted"], report["updated"], report["skipped"], report["failed"]) == (2, 0, 2, 3)
+    assert {issue["line"]: issue["status"] for issue in report["issues"]} == {
+        2: "failed", 3: "failed", 4: "skipped", 5: "failed", 6: "skipped",
+    }
+
+    assert (await client.get("/profiles/by-username/existing")).json()["bio"] == "old"
+    assert (await client.get("/profiles/suggest", params={"prefix": "car"})).json() == ["carol"]
+    assert (await client.get("/profiles/username-available", params={"username": "alice"})).json()["available"] is False
+
+
+@pytest.mark.asyncio
+async def test_import_profiles_update(client: AsyncClient):
+    """Test import với on_conflict=update ghi đè profile đã có (và làm mới cache)"""
+    await client.post("/profiles/", json={"username": "existing", "bio": "old"})
+    assert (await client.get("/profiles/by-username/existing")).json()["bio"] == "old"
+
+    body = "\n".join([
+        json.dumps({"username": "existing", "bio": "first"}),
+        json.dumps({"username": "existing", "bio": "new"}),
+        json.dumps({"username": "dave"}),
+    ]) + "\n"
+    response = await client.post(
+        "/profiles/import", params={"on_conflict": "update"}, content=body
+    )
+    report = response.json()
+    assert (report["inserted"], report["updated"], report["skipped"]) == (1, 1, 1)
+    assert report["issues"][0]["line"] == 1
+
+    assert (await client.get("/profiles/by-username/existing")).json()["bio"] == "new"
+    assert (await client.get("/profiles/count", params={"exact": True})).json()["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_import_profiles_update_partial_line(client: AsyncClient):
+    """Test on_conflict=update chỉ ghi đè field có trong dòng, field thiếu giữ nguyên"""
+    await client.post(
+        "/profiles/",
+        json={"username": "partial", "bio": "keep me", "user_id": "u-1"},
+    )
+    body = "\n".join([
+        json.dumps({"username": "partial", "avatar_url": "https://example.com/a.png"}),
+        json.dumps({"username": "fresh", "bio": "new"}),
+    ]) + "\n"
+    response = await client.post(
+        "/profiles/import", params={"on_conflict": "update"}, content=body
+    )
+    report = response.json()
+    assert (report["inserted"], report["updated"]) == (1, 1)
+
+    profile = (await client.get("/profiles/by-username/partial")).json()
+    assert profile["bio"] == "keep me"
+    assert profile["user_id"] == "u-1"
+    assert profile["avatar_url"] == "https://example.com/a.png"
+
+
+@pytest.mark.asyncio
+async def test_write_routes_set_read_your_writes_cookie(routing_client: AsyncClient):
+    """Test POST/PATCH profile (public_response) vẫn gửi cookie read-your-writes"""
+    response = await routing_client.post("/profiles/", json={"username": "cookieuser"})
+    assert response.status_code == 201
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get("set-cookie", "")
+
+    response = await routing_client.patch(
+        f"/profiles/{response.json()['id']}", json={"bio": "updated"}
+    )
+    assert response.status_code == 200
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get("set-cookie", "")
@@ -1,5 +1,14 @@
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.features.profiles.availability import (
+    add_username,
+    begin_username_filter_rebuild,
+    load_username_filter,
+    username_filter,
+)
+from app.features.profiles.autocomplete import username_index
+from app.features.profiles.model import Profile
 from app.features.profiles.service import ProfileService
 from app.features.profiles.schemas import ProfileCreate, ProfileUpdate
 from app.core.exceptions import NotFoundError, ConflictError, APIValidationError
@@ -304,3 +313,66 @@ async def test_delete_profile_not_found(test_session: AsyncSession):
 
     with pytest.raises(NotFoundError):
         await service.delete_profile(999)
+
+
+@pytest.mark.asyncio
+async def test_username_availability_uses_filter(test_session: AsyncSession, monkeypatch):
+    """Test username chắc chắn trống không query DB, username đã dùng thì có"""
+    monkeypatch.setattr(settings, "username_filter_authoritative", True)
+    service = ProfileService(test_session)
+    await service.create_profile(ProfileCreate(username="taken"))
+
+    assert await service.check_username_availability("taken") is False
+
+    async def _fail(*args, **kwargs):
+        raise AssertionError("username_exists should not be called")
+
+    monkeypatch.setattr(service.repository, "username_exists", _fail)
+    assert await service.check_username_availability("free_name") is True
+
+
+@pytest.mark.asyncio
+async def test_username_availability_not_authoritative(test_session: AsyncSession, monkeypatch):
+    """Test username do nơi khác ghi (không có trong filter) vẫn được xác nhận bằng DB"""
+    monkeypatch.setattr(settings, "username_filter_authoritative", False)
+    test_session.add(Profile(username="other_worker"))
+    await test_session.commit()
+
+    service = ProfileService(test_session)
+    assert await service.check_username_availability("other_worker") is False
+    assert await service.check_username_availability("free_name") is True
+
+
+def test_username_filter_rebuild_keeps_concurrent_adds():
+    """Test username được add trong lúc rebuild không bị mất khi load snapshot cũ"""
+    begin_username_filter_rebuild()
+    add_username("added_meanwhile")
+    load_username_filter(["alice"])
+
+    assert "alice" in username_filter
+    assert "added_meanwhile" in username_filter
+
+
+@pytest.mark.asyncio
+async def test_import_profiles_commits_each_batch(test_session: AsyncSession, monkeypatch):
+    """Test mỗi batch import được commit riêng (không giữ transaction cả request)"""
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    service = ProfileService(test_session)
+    commits = []
+    original_commit = test_session.commit
+
+    async def _commit():
+        commits.append(test_session.in_transaction())
+        await original_commit()
+
+    monkeypatch.setattr(test_session, "commit", _commit)
+
+    async def _chunks():
+        for name in ("ann", "ben", "cat", "dan", "eve"):
+            yield f'{{"username": "{name}"}}\n'.encode()
+
+    report = await service.import_profiles(_chunks())
+
+    assert report.inserted == 5
+    assert len(commits) == 3
+    assert username_index.suggest("") == ["ann", "ben", "cat", "dan", "eve"]
@@ -1,7 +1,9 @@
 import pytest
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.features.todos.model import Todo
 from app.features.todos.repository import TodoRepository
+from app.features.todos.schemas import TodoPublic
 
 
 @pytest.mark.asyncio
@@ -79,6 +81,19 @@ async def test_get_all(test_session: AsyncSession):
     assert len(paginated) == 1
 
 
+@pytest.mark.asyncio
+async def test_get_all_projection(test_session: AsyncSession):
+    """Test get_all chỉ đọc các cột public thành Row, không đưa object vào identity map"""
+    repository = TodoRepository(test_session)
+    await repository.create(Todo(title="Todo 1"))
+    test_session.expunge_all()
+
+    rows = await repository.get_all()
+    assert rows[0]._fields == tuple(TodoPublic.model_fields)
+    assert rows[0].title == "Todo 1"
+    assert len(test_session.identity_map) == 0
+
+
 @pytest.mark.asyncio
 async def test_update_todo(test_session: AsyncSession):
     """Test cập nhật todo"""
@@ -95,11 +110,10 @@ async def test_update_todo(test_session: AsyncSession):
     time.sleep(0.01)
     
     # Cập nhật
-    created_todo.title = "Updated Title"
-    created_todo.description = "Updated Description"
-    created_todo.completed = True
-    
-    updated_todo = await repository.update(created_todo)
+    updated_todo = await repository.update(
+        created_todo.id,
+        {"title": "Updated Title", "description": "Updated Description", "completed": True},
+    )
     
     assert updated_todo.title == "Updated Title"
     assert updated_todo.description == "Updated Description"
@@ -118,9 +132,77 @@ async def test_delete_todo(test_session: AsyncSession):
     todo_id = created_todo.id
     
     # Xóa
-    await repository.delete(created_todo)
+    assert (await repository.delete(todo_id)).id == todo_id
     
     # Verify đã xóa
     deleted_todo = await repository.get_by_id(todo_id)
     assert deleted_todo is None
 
+
+@pytest.mark.asyncio
+async def test_update_delete_not_found(test_session: AsyncSession):
+    """Test update/delete todo không tồn tại dựa vào số row bị ảnh hưởng"""
+    repository = TodoRepository(test_session)
+
+    assert await repository.update(999, {"title": "Updated"}) is None
+    assert await repository.delete(999) is None
+
+
+
+@pytest.mark.asyncio
+async def test_get_all_keyset(test_session: AsyncSession):
+    """Test phân trang keyset theo (created_at, id)"""
+    repository = TodoRepository(test_session)
+
+    for i in range(5):
+        await repository.create(Todo(title=f"Todo {i}"))
+
+    first_page = await repository.get_all(limit=2)
+    last = first_page[-1]
+    second_page = await repository.get_all(limit=2, after=(last.created_at, last.id))
+    offset_page = await repository.get_all(skip=2, limit=2)
+
+    assert [todo.id for todo in second_page] == [todo.id for todo in offset_page]
+    assert not {todo.id for todo in first_page} & {todo.id for todo in second_page}
+
+
+@pytest.mark.asyncio
+async def test_create_many_chunked(test_session: AsyncSession, monkeypatch):
+    """Test bulk insert chia chunk, giữ thứ tự input"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "bulk_insert_chunk_size", 3)
+    repository = TodoRepository(test_session)
+
+    values = [{"title": f"Todo {i}", "description": None, "completed": False} for i in range(10)]
+    created = await repository.create_many(values)
+
+    assert [row["title"] for row in created] == [value["title"] for value in values]
+    assert len({row["id"] for row in created}) == 10
+
+
+@pytest.mark.asyncio
+async def test_create_many_one_statement_per_chunk(test_session: AsyncSession, monkeypatch):
+    """Test bulk insert gửi một câu multi-row INSERT mỗi chunk (không insert từng row)"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "bulk_insert_chunk_size", 100)
+    repository = TodoRepository(test_session)
+    statements = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            statements.append(statement)
+
+    engine = test_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        values = [
+            {"title": f"Todo {i}", "description": None, "completed": i % 2 == 0}
+            for i in range(250)
+        ]
+        created = await repository.create_many(values)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert len(statements) == 3
+    assert [row["title"] for row in created] == [value["title"] for value in values]
+    assert [row["id"] for row in created] == sorted(row["id"] for row in created)
@@ -1,6 +1,12 @@
+import csv
+import io
+import json
 import pytest
 from httpx import AsyncClient
+from app.core.cache import clear_caches
+from app.core.database import READ_YOUR_WRITES_COOKIE
 from app.features.todos.model import Todo
+from app.features.todos.service import todo_cache
 
 
 @pytest.mark.asyncio
@@ -215,3 +221,336 @@ async def test_delete_todo_not_found(client: AsyncClient):
     response = await client.delete("/todos/999")
     assert response.status_code == 404
 
+
+
+@pytest.mark.asyncio
+async def test_get_todos_cursor(client: AsyncClient):
+    """Test API phân trang bằng cursor (header X-Next-Cursor)"""
+    for i in range(5):
+        await client.post("/todos/", json={"title": f"Todo {i}"})
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/todos/", params=params)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Mới nhất trước, không trùng, không thiếu
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == 5
+
+
+@pytest.mark.asyncio
+async def test_get_todos_invalid_cursor(client: AsyncClient):
+    """Test API với cursor không hợp lệ"""
+    response = await client.get("/todos/?cursor=not-a-cursor")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_create_todos_bulk(client: AsyncClient):
+    """Test API tạo nhiều todos, kết quả giữ thứ tự input"""
+    payload = [
+        {"title": f"Bulk {i}", "completed": i % 2 == 0}
+        for i in range(25)
+    ]
+
+    response = await client.post("/todos/bulk", json=payload)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert [item["title"] for item in data] == [item["title"] for item in payload]
+    assert [item["completed"] for item in data] == [item["completed"] for item in payload]
+    assert all(item["id"] is not None and item["created_at"] for item in data)
+
+    response = await client.get("/todos/?limit=100")
+    assert len(response.json()) == 25
+
+
+@pytest.mark.asyncio
+async def test_create_todos_bulk_invalid(client: AsyncClient):
+    """Test API tạo nhiều todos với dữ liệu không hợp lệ"""
+    response = await client.post("/todos/bulk", json=[])
+    assert response.status_code == 422
+
+    response = await client.post("/todos/bulk", json=[{"title": "ok"}, {}])
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_update_todos_bulk(client: AsyncClient):
+    """Test API cập nhật nhiều todos theo filter"""
+    response = await client.post(
+        "/todos/bulk",
+        json=[{"title": f"Todo {i}", "completed": i < 2} for i in range(5)]
+    )
+    ids = [item["id"] for item in response.json()]
+
+    response = await client.patch(
+        "/todos/bulk",
+        json={"filter": {"completed": False}, "values": {"completed": True}}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"affected": 3}
+
+    response = await client.get("/todos/?completed=false")
+    assert response.json() == []
+
+    # Filter theo ids kết hợp completed
+    response = await client.patch(
+        "/todos/bulk",
+        json={"filter": {"ids": ids[:2], "completed": True}, "values": {"title": "Renamed"}}
+    )
+    assert response.json() == {"affected": 2}
+    response = await client.get(f"/todos/{ids[0]}")
+    assert response.json()["title"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_update_todos_bulk_requires_filter(client: AsyncClient):
+    """Test bulk update không có filter hoặc không có values"""
+    response = await client.patch(
+        "/todos/bulk", json={"filter": {}, "values": {"completed": True}}
+    )
+    assert response.status_code == 422
+
+    response = await client.patch(
+        "/todos/bulk", json={"filter": {"completed": False}, "values": {}}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_delete_todos_bulk(client: AsyncClient):
+    """Test API xóa nhiều todos theo filter"""
+    response = await client.post(
+        "/todos/bulk",
+        json=[{"title": f"Todo {i}", "completed": i < 3} for i in range(5)]
+    )
+    ids = [item["id"] for item in response.json()]
+
+    response = await client.delete("/todos/bulk?completed=true")
+    assert response.status_code == 200
+    assert response.json() == {"affected": 3}
+
+    response = await client.delete(f"/todos/bulk?ids={ids[3]}&ids={ids[0]}")
+    assert response.json() == {"affected": 1}
+
+    response = await client.get("/todos/")
+    assert [item["id"] for item in response.json()] == [ids[4]]
+
+    # Không có filter
+    response = await client.delete("/todos/bulk")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_todo_cache_invalidated_on_bulk_update(client: AsyncClient):
+    """Test cache todo được invalidate sau update đơn lẻ và bulk update"""
+    created = (await client.post("/todos/", json={"title": "Cached"})).json()
+    assert (await client.get(f"/todos/{created['id']}")).json()["completed"] is False
+
+    await client.patch(f"/todos/{created['id']}", json={"title": "Renamed"})
+    assert (await client.get(f"/todos/{created['id']}")).json()["title"] == "Renamed"
+
+    await client.patch("/todos/bulk", json={
+        "filter": {"completed": False},
+        "values": {"completed": True},
+    })
+    assert (await client.get(f"/todos/{created['id']}")).json()["completed"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_todo_conditional(client: AsyncClient):
+    """Test ETag/Last-Modified và 304 cho GET /todos/{id}"""
+    created = (await client.post("/todos/", json={"title": "Conditional"})).json()
+    url = f"/todos/{created['id']}"
+
+    response = await client.get(url)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert etag.startswith('"')
+
+    # Từ cache
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    # Không có trong cache: chỉ query updated_at
+    clear_caches()
+    response = await client.get(url, headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    response = await client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    await client.patch(url, json={"completed": True})
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["completed"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_todo_conditional_counts_miss_once(client: AsyncClient):
+    """Test GET có điều kiện bị miss chỉ đếm một miss (validators và load không tra cache hai lần)"""
+    created = (await client.post("/todos/", json={"title": "Miss"})).json()
+    url = f"/todos/{created['id']}"
+    clear_caches()
+
+    misses = todo_cache.stats.misses
+    response = await client.get(url, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert todo_cache.stats.misses == misses + 1
+
+
+@pytest.mark.asyncio
+async def test_get_todos_etag(client: AsyncClient):
+    """Test ETag cho trang danh sách thay đổi khi dữ liệu thay đổi"""
+    await client.post("/todos/", json={"title": "First"})
+
+    etag = (await client.get("/todos/")).headers["etag"]
+    response = await client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await client.post("/todos/", json={"title": "Second"})
+    response = await client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_todos_list_cache(client: AsyncClient):
+    """Test cache trang danh sách theo tham số query và làm mới sau khi ghi"""
+    await client.post("/todos/", json={"title": "First"})
+    before = (await client.get("/health/cache")).json()["caches"]["todo_lists"]
+
+    first = await client.get("/todos/", params={"completed": False})
+    again = await client.get("/todos/", params={"completed": False})
+    assert again.content == first.content
+
+    status = (await client.get("/health/cache")).json()["caches"]["todo_lists"]
+    assert status["hits"] - before["hits"] == 1
+    assert status["misses"] - before["misses"] == 1
+    assert status["bytes"] > 0
+
+    # Ghi bất kỳ làm mọi trang cũ hết hiệu lực
+    await client.post("/todos/bulk", json=[{"title": "Second"}])
+    response = await client.get("/todos/", params={"completed": False})
+    assert [todo["title"] for todo in response.json()] == ["Second", "First"]
+
+
+@pytest.mark.asyncio
+async def test_todos_total_count(client: AsyncClient):
+    """Test endpoint count và header X-Total-Count (opt-in)"""
+    await client.post("/todos/bulk", json=[
+        {"title": "A", "completed": True},
+        {"title": "B"},
+        {"title": "C"},
+    ])
+
+    response = await client.get("/todos/count")
+    assert response.json() == {"count": 3, "exact": True}
+    response = await client.get("/todos/count", params={"completed": True, "exact": True})
+    assert response.json() == {"count": 1, "exact": True}
+
+    response = await client.get("/todos/", params={"limit": 1})
+    assert "x-total-count" not in response.headers
+
+    response = await client.get("/todos/", params={"limit": 1, "include_total": True})
+    assert response.headers["x-total-count"] == "3"
+    assert "x-total-count-estimated" not in response.headers
+
+    # Count cache bị làm mới sau khi ghi
+    await client.post("/todos/", json={"title": "D"})
+    assert (await client.get("/todos/count")).json()["count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_todo_stats(client: AsyncClient):
+    """Test /todos/stats được cập nhật theo mọi đường ghi"""
+    response = await client.get("/todos/stats")
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+
+    created = (await client.post("/todos/", json={"title": "A"})).json()
+    await client.post("/todos/bulk", json=[
+        {"title": "B", "completed": True},
+        {"title": "C"},
+        {"title": "D"},
+    ])
+    await client.patch(f"/todos/{created['id']}", json={"completed": True})
+    await client.patch("/todos/bulk", json={
+        "filter": {"completed": False},
+        "values": {"completed": True},
+    })
+    await client.patch("/todos/bulk", json={
+        "filter": {"ids": [created["id"]]},
+        "values": {"completed": False},
+    })
+
+    stats = (await client.get("/todos/stats")).json()
+    assert (stats["total"], stats["completed"], stats["open"]) == (4, 3, 1)
+
+    await client.delete(f"/todos/{created['id']}")
+    await client.delete("/todos/bulk", params={"completed": True})
+
+    stats = (await client.get("/todos/stats")).json()
+    assert (stats["total"], stats["completed"], stats["open"]) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_export_todos(client: AsyncClient):
+    """Test export todos dạng NDJSON (có filter) và CSV"""
+    await client.post("/todos/bulk", json=[
+        {"title": "A", "completed": True},
+        {"title": "B, with comma"},
+        {"title": "C"},
+    ])
+
+    response = await client.get("/todos/export", params={"completed": False})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="todos.ndjson"' in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == ["B, with comma", "C"]
+
+    response = await client.get("/todos/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    title = rows[0].index("title")
+    assert {"id", "completed", "created_at"} <= set(rows[0])
+    assert [row[title] for row in rows[1:]] == ["A", "B, with comma", "C"]
+
+
+@pytest.mark.asyncio
+async def test_export_todos_empty_csv(client: AsyncClient):
+    """Test export CSV khi không có todo vẫn trả về dòng header"""
+    response = await client.get("/todos/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert len(list(csv.reader(io.StringIO(response.text)))) == 1
+
+
+@pytest.mark.asyncio
+async def test_write_routes_set_read_your_writes_cookie(routing_client: AsyncClient):
+    """Test các route ghi trả về public_response vẫn gửi cookie read-your-writes"""
+    response = await routing_client.post("/todos/", json={"title": "Cookie"})
+    assert response.status_code == 201
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get("set-cookie", "")
+    todo_id = response.json()["id"]
+
+    response = await routing_client.post("/todos/bulk", json=[{"title": "A"}, {"title": "B"}])
+    assert response.status_code == 201
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get("set-cookie", "")
+
+    response = await routing_client.patch(f"/todos/{todo_id}", json={"completed": True})
+    assert response.status_code == 200
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get("set-cookie", "")
@@ -1,9 +1,12 @@
 import pytest
+from sqlalchemy import event, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from app.features.todos.model import Todo
+from app.features.todos.model import Todo, TodoCounter
 from app.features.todos.schemas import TodoCreate, TodoUpdate
 from app.features.todos.service import TodoService
+from app.features.todos.repository import TodoRepository
+from app.features.todos.stats import reconcile_todo_stats
 
 
 @pytest.mark.asyncio
@@ -162,3 +165,69 @@ async def test_delete_todo_not_found(test_session: AsyncSession):
     
     assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
 
+
+
+@pytest.mark.asyncio
+async def test_todo_stats_reconcile(test_session: AsyncSession):
+    """Test bộ đếm trong DB rollback cùng transaction và reconcile sửa drift"""
+    service = TodoService(test_session)
+    await service.create_todo(TodoCreate(title="Committed", completed=True))
+    await test_session.commit()
+
+    await service.create_todo(TodoCreate(title="Rolled back"))
+    await test_session.rollback()
+
+    stats = await service.get_stats()
+    assert (stats.total, stats.completed) == (1, 1)
+    assert stats.reconciled_at is not None
+
+    # Drift giả lập (ví dụ ghi thẳng vào DB)
+    await TodoRepository(test_session).add_to_counter(3, 5, 5)
+    await test_session.commit()
+    assert (await service.get_stats()).total == 6
+
+    await reconcile_todo_stats(test_session)
+    await test_session.commit()
+    stats = await service.get_stats()
+    assert (stats.total, stats.completed, stats.open) == (1, 1, 0)
+
+@pytest.mark.asyncio
+async def test_todo_stats_sharded(test_session: AsyncSession, monkeypatch):
+    """Test delta rải vào nhiều shard, tổng đúng và update_todo không đọc trạng thái cũ trước"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "todo_stats_shards", 4)
+    service = TodoService(test_session)
+    await reconcile_todo_stats(test_session)
+
+    todos = [await service.create_todo(TodoCreate(title=f"Todo {i}")) for i in range(20)]
+    await test_session.commit()
+    shards = await test_session.execute(
+        select(func.count()).select_from(TodoCounter).where(TodoCounter.total != 0)
+    )
+    assert shards.scalar_one() > 1
+
+    selects = []
+
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            selects.append(statement)
+
+    engine = test_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count_selects)
+    try:
+        await service.update_todo(todos[0].id, TodoUpdate(completed=True))
+        # Không đổi trạng thái: bộ đếm giữ nguyên
+        await service.update_todo(todos[0].id, TodoUpdate(completed=True))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_selects)
+    await test_session.commit()
+
+    assert selects == []
+    stats = await service.get_stats()
+    assert (stats.total, stats.completed, stats.open) == (20, 1, 19)
+
+    await reconcile_todo_stats(test_session)
+    counters = (await test_session.execute(
+        select(TodoCounter.id, TodoCounter.total).order_by(TodoCounter.id)
+    )).all()
+    assert [tuple(row) for row in counters] == [(0, 20), (1, 0), (2, 0), (3, 0)]
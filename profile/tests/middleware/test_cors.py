@@ -0,0 +1,41 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from app.middleware.cors import setup_cors
+from app.middleware.request_id import RequestIDMiddleware
+
+
+async def _echo(request: Request) -> JSONResponse:
+    return JSONResponse({})
+
+
+@pytest.fixture
+async def cors_client():
+    app = Starlette(routes=[Route("/echo", _echo)])
+    app.add_middleware(RequestIDMiddleware)
+    setup_cors(app)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_server_timing_visible_cross_origin(cors_client: AsyncClient):
+    """Test origin được phép đọc được Server-Timing (expose + Timing-Allow-Origin)"""
+    response = await cors_client.get("/echo", headers={"Origin": "http://localhost:3000"})
+
+    assert "server-timing" in response.headers
+    assert "Server-Timing" in response.headers["access-control-expose-headers"]
+    assert response.headers["timing-allow-origin"] == "http://localhost:3000"
+
+
+@pytest.mark.asyncio
+async def test_timing_allow_origin_only_for_allowed_origins(cors_client: AsyncClient):
+    """Test origin không được phép (hoặc không có Origin) không nhận Timing-Allow-Origin"""
+    response = await cors_client.get("/echo", headers={"Origin": "http://evil.example"})
+    assert "timing-allow-origin" not in response.headers
+
+    response = await cors_client.get("/echo")
+    assert "timing-allow-origin" not in response.headers
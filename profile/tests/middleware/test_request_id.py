@@ -0,0 +1,96 @@
+import logging
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from app.core.config import settings
+from app.core.context import get_request_id
+from app.middleware.request_id import RequestIDMiddleware
+
+
+async def _echo(request: Request) -> JSONResponse:
+    return JSONResponse({"state": request.state.request_id, "context": get_request_id()})
+
+
+async def _stream(request: Request) -> StreamingResponse:
+    async def chunks():
+        for i in range(3):
+            yield f"{i}\n".encode()
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+@pytest.fixture
+async def middleware_client():
+    app = Starlette(routes=[Route("/echo", _echo), Route("/stream", _stream)])
+    app.add_middleware(RequestIDMiddleware)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_request_id_generated(middleware_client: AsyncClient):
+    """Test request ID được tạo mới, duy nhất và có trong state, context var, header"""
+    first = await middleware_client.get("/echo")
+    second = await middleware_client.get("/echo")
+
+    request_id = first.headers["x-request-id"]
+    assert first.json() == {"state": request_id, "context": request_id}
+    assert second.headers["x-request-id"] != request_id
+    assert get_request_id() is None
+
+
+@pytest.mark.asyncio
+async def test_request_id_from_client(middleware_client: AsyncClient):
+    """Test dùng lại X-Request-ID hợp lệ của client, bỏ qua giá trị không hợp lệ"""
+    response = await middleware_client.get("/echo", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+
+    response = await middleware_client.get("/echo", headers={"X-Request-ID": "a b\tc"})
+    assert response.headers["x-request-id"] != "a b\tc"
+    response = await middleware_client.get("/echo", headers={"X-Request-ID": "x" * 200})
+    assert len(response.headers["x-request-id"]) < 200
+
+
+@pytest.mark.asyncio
+async def test_request_id_streaming(middleware_client: AsyncClient):
+    """Test streaming response đi qua middleware nguyên vẹn"""
+    response = await middleware_client.get("/stream")
+    assert response.text == "0\n1\n2\n"
+    assert "x-request-id" in response.headers
+
+
+async def _fail(request: Request) -> JSONResponse:
+    return JSONResponse({}, status_code=503)
+
+
+@pytest.mark.asyncio
+async def test_request_log_sampling(monkeypatch, caplog):
+    """Test request thành công được lấy mẫu, còn 5xx và request chậm luôn được log"""
+    app = Starlette(routes=[Route("/echo", _echo), Route("/fail", _fail)])
+    app.add_middleware(RequestIDMiddleware)
+    monkeypatch.setattr(settings, "log_request_sample_rate", 0.0)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="app.middleware.request_id"):
+            await client.get("/echo")
+            await client.get("/fail")
+            assert [record.levelno for record in caplog.records] == [logging.ERROR]
+            assert caplog.records[0].status_code == 503
+
+            caplog.clear()
+            monkeypatch.setattr(settings, "log_slow_request_ms", 0.0)
+            await client.get("/echo")
+            assert [record.levelno for record in caplog.records] == [logging.WARNING]
+
+
+@pytest.mark.asyncio
+async def test_server_timing(middleware_client: AsyncClient, monkeypatch):
+    """Test header Server-Timing (db, serialize, app) và tắt được qua settings"""
+    response = await middleware_client.get("/echo")
+    assert response.headers["server-timing"].startswith('db;dur=0.0;desc="0 queries", serialize;dur=')
+
+    monkeypatch.setattr(settings, "server_timing_enabled", False)
+    response = await middleware_client.get("/echo")
+    assert "server-timing" not in response.headers